@@ -0,0 +1,179 @@
+"""
+Show how the category indexes change the query plans of category lookups.
+
+Two scratch copies of the questions table are filled with synthetic rows,
+one without indexes (the schema before the migration) and one with the
+``(category, id)`` and ``(category, difficulty)`` indexes, and the plans and
+timings of the category page, the quiz pool and the difficulty filter are
+printed for both.
+
+Usage::
+
+    DATABASE_URL=postgres://localhost:5432/trivia_bench \\
+        python -m benchmarks.category_plan --rows 1000000
+"""
+import argparse
+import os
+import time
+
+from sqlalchemy import create_engine, text
+
+
+TABLES = {
+    'bench_questions_plain': [],
+    'bench_questions_indexed': [
+        'CREATE INDEX {table}_category_id ON {table} (category, id)',
+        'CREATE INDEX {table}_category_difficulty '
+        'ON {table} (category, difficulty)',
+    ],
+}
+
+QUERIES = {
+    'category_page': (
+        'SELECT id, question, answer, category, difficulty FROM {table} '
+        'WHERE category = :category ORDER BY id LIMIT 10'
+    ),
+    'category_count': (
+        'SELECT count(*) FROM {table} WHERE category = :category'
+    ),
+    'quiz_pool': 'SELECT id FROM {table} WHERE category = :category',
+    'category_difficulty': (
+        'SELECT id FROM {table} '
+        'WHERE category = :category AND difficulty = :difficulty'
+    ),
+}
+
+POSTGRES_FILL = (
+    'INSERT INTO {table} (id, question, answer, category, difficulty) '
+    "SELECT n, 'Question ' || n, 'Answer ' || n, "
+    '1 + n % :categories, 1 + n % 5 FROM generate_series(1, :rows) AS n'
+)
+
+SQLITE_FILL = (
+    'WITH RECURSIVE numbers(n) AS ('
+    'SELECT 1 UNION ALL SELECT n + 1 FROM numbers WHERE n < :rows) '
+    'INSERT INTO {table} (id, question, answer, category, difficulty) '
+    "SELECT n, 'Question ' || n, 'Answer ' || n, "
+    '1 + n % :categories, 1 + n % 5 FROM numbers'
+)
+
+
+def create_tables(connection, rows, categories):
+    """
+    Create and fill the scratch tables.
+
+    :param connection:
+    :param rows: number of synthetic questions per table.
+    :param categories: number of distinct categories.
+    """
+    postgres = connection.dialect.name == 'postgresql'
+    for table, indexes in TABLES.items():
+        connection.execute(text(f'DROP TABLE IF EXISTS {table}'))
+        connection.execute(text(
+            f'CREATE TABLE {table} (id INTEGER PRIMARY KEY, question TEXT, '
+            'answer TEXT, category INTEGER, difficulty INTEGER)'
+        ))
+        fill = POSTGRES_FILL if postgres else SQLITE_FILL
+        connection.execute(
+            text(fill.format(table=table)),
+            {'rows': rows, 'categories': categories}
+        )
+        for index in indexes:
+            connection.execute(text(index.format(table=table)))
+        connection.execute(text(f'ANALYZE {table}'))
+
+
+def explain(connection, query, params):
+    """
+    Return the plan of query as a list of lines.
+
+    :param connection:
+    :param query:
+    :param params:
+    :return:
+    """
+    if connection.dialect.name == 'postgresql':
+        query = 'EXPLAIN (ANALYZE, BUFFERS) ' + query
+        return [row[0] for row in connection.execute(text(query), params)]
+
+    return [
+        row[-1] for row in
+        connection.execute(text('EXPLAIN QUERY PLAN ' + query), params)
+    ]
+
+
+def time_query(connection, query, params, repeat):
+    """
+    Return the best wall time of query in milliseconds over repeat runs.
+
+    :param connection:
+    :param query:
+    :param params:
+    :param repeat:
+    :return:
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        connection.execute(text(query), params).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def run(database_url, rows, categories, repeat, keep):
+    """
+    Fill the scratch tables and return the plans and timings of the queries.
+
+    :return: dict of query name to table name to plan and best time.
+    """
+    engine = create_engine(database_url)
+    params = {'category': 1, 'difficulty': 3}
+    results = {}
+
+    with engine.begin() as connection:
+        create_tables(connection, rows, categories)
+
+    with engine.connect() as connection:
+        for name, query in QUERIES.items():
+            results[name] = {}
+            for table in TABLES:
+                table_query = query.format(table=table)
+                results[name][table] = {
+                    'plan': explain(connection, table_query, params),
+                    'best_ms': time_query(
+                        connection, table_query, params, repeat
+                    ),
+                }
+
+    if not keep:
+        with engine.begin() as connection:
+            for table in TABLES:
+                connection.execute(text(f'DROP TABLE IF EXISTS {table}'))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--database-url', default=os.environ.get('DATABASE_URL')
+    )
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--categories', type=int, default=6)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true')
+    args = parser.parse_args()
+
+    results = run(
+        args.database_url, args.rows, args.categories, args.repeat, args.keep
+    )
+    for name, tables in results.items():
+        print(f'== {name}')
+        for table, result in tables.items():
+            print(f'-- {table}: {result["best_ms"]:.2f} ms')
+            for line in result['plan']:
+                print(f'   {line}')
+
+
+if __name__ == '__main__':
+    main()
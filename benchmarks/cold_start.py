@@ -0,0 +1,118 @@
+"""
+Measure the cold start of the app, from import to the first response.
+
+Every run starts a fresh interpreter which imports ``flaskr`` and serves
+one request through the test client, so nothing is shared between runs.
+``--create-all`` issues ``db.create_all()`` before the first request like
+importing the app did before the app factory, to compare both.
+
+Usage::
+
+    python -m benchmarks.cold_start --runs 20 --path /categories
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child interpreter, prints its timings in ms as JSON.
+CHILD = '''
+import json, sys, time
+started_at = time.perf_counter()
+import flaskr
+imported_at = time.perf_counter()
+if {create_all!r}:
+    from models import db
+    with flaskr.app.app_context():
+        db.create_all()
+response = flaskr.app.test_client().get({path!r})
+responded_at = time.perf_counter()
+print(json.dumps({{
+    'status': response.status_code,
+    'import_ms': (imported_at - started_at) * 1000,
+    'first_response_ms': (responded_at - imported_at) * 1000,
+    'total_ms': (responded_at - started_at) * 1000,
+}}))
+'''
+
+
+def run_once(path, create_all, env):
+    """
+    Start an interpreter serving one request and return its timings.
+
+    :param path: url path of the request.
+    :param create_all: issue the DDL checks before the request.
+    :param env:
+    :return:
+    """
+    started_at = time.perf_counter()
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD.format(path=path, create_all=create_all)],
+        cwd=ROOT, env=env
+    )
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started_at) * 1000
+    return result
+
+
+def run(runs, path, create_all, env):
+    """
+    Return the median timings in ms of given number of cold starts.
+
+    :param runs:
+    :param path:
+    :param create_all:
+    :param env:
+    :return:
+    """
+    results = [run_once(path, create_all, env) for _ in range(runs)]
+    return {
+        'runs': runs,
+        'path': path,
+        'create_all': create_all,
+        'statuses': sorted({result['status'] for result in results}),
+        'median_ms': {
+            name: statistics.median(result[name] for result in results)
+            for name in (
+                'import_ms', 'first_response_ms', 'total_ms', 'process_ms'
+            )
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--database-url',
+        default=os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(
+            tempfile.gettempdir(), 'trivia_cold_start_bench.db'
+        )
+    )
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--path', default='/healthz')
+    parser.add_argument('--create-all', action='store_true')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=args.database_url)
+    results = run(args.runs, args.path, args.create_all, env)
+
+    print(f'{results["runs"]} cold starts of GET {results["path"]}, '
+          f'create_all: {results["create_all"]}, '
+          f'statuses: {results["statuses"]}')
+    for name, median_ms in results['median_ms'].items():
+        print(f'{name:<18} {median_ms:9.2f} ms')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Measure how many concurrent connections a running server sustains.
+
+Opens an increasing number of concurrent keep-alive connections against a
+server started with the sync workers and one started with the gevent
+workers, and reports throughput, latency percentiles and errors per level,
+e.g.::
+
+    gunicorn flaskr:app --bind 127.0.0.1:8000
+    GUNICORN_WORKER_CLASS=gevent gunicorn flaskr:app --bind 127.0.0.1:8001
+
+    python -m benchmarks.concurrency --url http://127.0.0.1:8000 --label sync
+    python -m benchmarks.concurrency --url http://127.0.0.1:8001 --label gevent
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, fraction):
+    """
+    Return the given percentile of values, nearest rank.
+
+    :param values: sorted list.
+    :param fraction: between 0 and 1.
+    :return:
+    """
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Return throughput, latency percentiles in ms and error count.
+
+    :param latencies: list of request durations in seconds.
+    :param errors: number of failed requests.
+    :param elapsed: duration of the run in seconds.
+    :return:
+    """
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': (percentile(latencies, 0.50) or 0) * 1000,
+        'p95_ms': (percentile(latencies, 0.95) or 0) * 1000,
+        'p99_ms': (percentile(latencies, 0.99) or 0) * 1000,
+    }
+
+
+def run_client(url, method, path, body, headers, deadline, timeout, result):
+    """
+    Send requests on one keep-alive connection until deadline.
+
+    :param result: dict collecting latencies and errors.
+    """
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection \
+        if parts.scheme == 'https' else http.client.HTTPConnection
+    connection = None
+
+    while time.monotonic() < deadline:
+        started_at = time.monotonic()
+        try:
+            if connection is None:
+                connection = connection_class(parts.netloc, timeout=timeout)
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                raise http.client.HTTPException(response.status)
+            result['latencies'].append(time.monotonic() - started_at)
+        except (OSError, http.client.HTTPException):
+            result['errors'] += 1
+            if connection is not None:
+                connection.close()
+            connection = None
+            time.sleep(0.01)
+
+    if connection is not None:
+        connection.close()
+
+
+def run_level(
+    url, method, path, body, headers, concurrency, duration, timeout
+):
+    """
+    Run concurrency clients for duration seconds.
+
+    :return: summary of the level.
+    """
+    deadline = time.monotonic() + duration
+    results = [
+        {'latencies': [], 'errors': 0} for _ in range(concurrency)
+    ]
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(url, method, path, body, headers, deadline, timeout,
+                  result),
+            daemon=True
+        )
+        for result in results
+    ]
+
+    started_at = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started_at
+
+    return summarize(
+        [latency for result in results for latency in result['latencies']],
+        sum(result['errors'] for result in results),
+        elapsed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--path', default='/questions')
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--data', help='JSON request body')
+    parser.add_argument('--token', help='bearer token sent with requests')
+    parser.add_argument(
+        '--levels', default='10,50,100,200,500',
+        help='comma separated concurrency levels'
+    )
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--label', default='server')
+    parser.add_argument('--output', help='write results as JSON to a file')
+    args = parser.parse_args()
+
+    headers = {'Content-Type': 'application/json'}
+    if args.token:
+        headers['Authorization'] = f'Bearer {args.token}'
+
+    levels = {}
+    for concurrency in map(int, args.levels.split(',')):
+        summary = run_level(
+            args.url, args.method, args.path, args.data, headers,
+            concurrency, args.duration, args.timeout
+        )
+        levels[concurrency] = summary
+        print(
+            f'{args.label} c={concurrency:<5} '
+            f'{summary["throughput"]:8.1f} req/s  '
+            f'p50 {summary["p50_ms"]:8.1f} ms  '
+            f'p99 {summary["p99_ms"]:8.1f} ms  '
+            f'errors {summary["errors"]}'
+        )
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'label': args.label, 'url': args.url,
+                       'path': args.path, 'levels': levels}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
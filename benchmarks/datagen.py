@@ -0,0 +1,125 @@
+"""
+Fill a scratch database with a synthetic trivia dataset.
+
+Creates the tables if needed, then adds categories and questions of
+varying length until the database holds ``--questions`` questions. The
+rows are generated from ``--seed`` so runs on the same size are comparable.
+
+Usage::
+
+    DATABASE_URL=postgres://localhost:5432/trivia_bench \\
+        python -m benchmarks.datagen --questions 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+CATEGORY_TYPES = [
+    'Science', 'Art', 'Geography', 'History', 'Entertainment', 'Sports'
+]
+WORDS = (
+    'which what who where when river city painter element planet war '
+    'king queen film song team record year first largest smallest oldest '
+    'capital author invented discovered won named famous ocean mountain'
+).split()
+BATCH_SIZE = 10000
+
+
+def make_question(rng, number, categories):
+    """
+    Return the columns of a synthetic question.
+
+    :param rng: random generator.
+    :param number: position of the question, keeps the texts unique.
+    :param categories: number of categories.
+    :return:
+    """
+    words = rng.choices(WORDS, k=rng.randint(4, 16))
+    return {
+        'question': f'{" ".join(words).capitalize()} #{number}?',
+        'answer': ' '.join(rng.choices(WORDS, k=rng.randint(1, 3))),
+        'category': rng.randint(1, categories),
+        'difficulty': rng.randint(1, 5),
+    }
+
+
+def generate(db, questions, categories=len(CATEGORY_TYPES), seed=0,
+             reset=False):
+    """
+    Fill the database of the current app context with synthetic rows.
+
+    :param db:
+    :param questions: number of questions the table holds afterwards.
+    :param categories: number of categories.
+    :param seed:
+    :param reset: drop all the tables first.
+    :return: number of questions added.
+    """
+    from models import Category, Question, bump_data_version
+
+    if reset:
+        db.drop_all()
+    db.create_all()
+
+    for number in range(Category.query.count(), categories):
+        db.session.add(Category(
+            CATEGORY_TYPES[number % len(CATEGORY_TYPES)]
+            + (f' {number // len(CATEGORY_TYPES)}'
+               if number >= len(CATEGORY_TYPES) else '')
+        ))
+    db.session.commit()
+
+    existing = Question.query.count()
+    rng = random.Random(f'{seed}-{existing}')
+    batch = []
+    for number in range(existing, questions):
+        batch.append(make_question(rng, number, categories))
+        if len(batch) == BATCH_SIZE:
+            db.session.execute(Question.__table__.insert(), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(Question.__table__.insert(), batch)
+
+    # Cached reads of the previous dataset must not be served.
+    bump_data_version()
+    db.session.commit()
+    return max(0, questions - existing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--database-url',
+        default=os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(
+            tempfile.gettempdir(), 'trivia_bench.db'
+        )
+    )
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument(
+        '--categories', type=int, default=len(CATEGORY_TYPES)
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--reset', action='store_true',
+                        help='drop the existing tables first')
+    args = parser.parse_args()
+
+    from flaskr import create_app
+    from models import db
+
+    app = create_app({'DATABASE_URL': args.database_url})
+    started_at = time.perf_counter()
+    with app.app_context():
+        added = generate(
+            db, args.questions, categories=args.categories, seed=args.seed,
+            reset=args.reset
+        )
+    print(f'{added} questions added in '
+          f'{time.perf_counter() - started_at:.1f} s, '
+          f'{args.questions} in {args.database_url}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""
+Load test a running server with a mix of the api endpoints.
+
+Runs ``--concurrency`` keep-alive clients for ``--duration`` seconds, every
+request picks an endpoint of the mix at random, and reports throughput and
+latency percentiles per endpoint. The quiz endpoints need a ``--token``
+accepted by the server, e.g. one from ``benchmarks.signing``::
+
+    python -m benchmarks.datagen --questions 100000
+    python -m benchmarks.signing --jwks /tmp/jwks.json --permission play:quiz
+    JWKS_URL=file:///tmp/jwks.json gunicorn flaskr:app --bind 127.0.0.1:8000
+
+    python -m benchmarks.loadtest --token <token> --output before.json
+    python -m benchmarks.loadtest --token <token> --compare before.json
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.concurrency import summarize
+
+# name: (method, path, body, needs a token), {page} and {category} are
+# picked at random for every request.
+ENDPOINTS = {
+    'categories': ('GET', '/categories', None, False),
+    'questions_page': ('GET', '/questions?page={page}', None, False),
+    'category_questions': (
+        'GET', '/categories/{category}/questions', None, False
+    ),
+    'search': (
+        'POST', '/questions/search', {'searchTerm': 'river'}, False
+    ),
+    'quiz_draw': (
+        'POST', '/quizzes',
+        {'previous_questions': [], 'quiz_category': {'id': '{category}'}},
+        True
+    ),
+}
+
+
+def build_request(endpoint, pages, categories, rng):
+    """
+    Return method, path and body of a request to given endpoint.
+
+    :param endpoint:
+    :param pages: highest page requested.
+    :param categories: highest category id requested.
+    :param rng: random generator.
+    :return:
+    """
+    method, path, body, _ = ENDPOINTS[endpoint]
+    values = {
+        'page': rng.randint(1, pages),
+        'category': rng.randint(1, categories),
+    }
+    path = path.format(**values)
+    if body is not None:
+        body = json.dumps(body).replace(
+            '"{category}"', str(values['category'])
+        )
+    return method, path, body
+
+
+def run_client(url, endpoints, headers, options, deadline, result):
+    """
+    Send requests on one keep-alive connection until deadline.
+
+    :param result: dict of the latencies and errors of every endpoint.
+    """
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection \
+        if parts.scheme == 'https' else http.client.HTTPConnection
+    connection = None
+    rng = random.Random()
+
+    while time.monotonic() < deadline:
+        endpoint = rng.choice(endpoints)
+        method, path, body = build_request(
+            endpoint, options['pages'], options['categories'], rng
+        )
+        started_at = time.monotonic()
+        try:
+            if connection is None:
+                connection = connection_class(
+                    parts.netloc, timeout=options['timeout']
+                )
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400 and response.status != 404:
+                raise http.client.HTTPException(response.status)
+            result[endpoint]['latencies'].append(
+                time.monotonic() - started_at
+            )
+        except (OSError, http.client.HTTPException):
+            result[endpoint]['errors'] += 1
+            if connection is not None:
+                connection.close()
+            connection = None
+            time.sleep(0.01)
+
+    if connection is not None:
+        connection.close()
+
+
+def run(url, endpoints, token, concurrency, duration, options):
+    """
+    Run the clients and return the summary of every endpoint.
+
+    :param url:
+    :param endpoints: names of the endpoints of the mix.
+    :param token: bearer token, the endpoints needing one are left out
+        without it.
+    :param concurrency:
+    :param duration: seconds.
+    :param options: pages, categories and timeout.
+    :return:
+    """
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    else:
+        endpoints = [
+            endpoint for endpoint in endpoints if not ENDPOINTS[endpoint][3]
+        ]
+
+    deadline = time.monotonic() + duration
+    results = [
+        {endpoint: {'latencies': [], 'errors': 0} for endpoint in endpoints}
+        for _ in range(concurrency)
+    ]
+    threads = [
+        threading.Thread(
+            target=run_client,
+            args=(url, endpoints, headers, options, deadline, result),
+            daemon=True
+        )
+        for result in results
+    ]
+
+    started_at = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started_at
+
+    summaries = {
+        endpoint: summarize(
+            [latency for result in results
+             for latency in result[endpoint]['latencies']],
+            sum(result[endpoint]['errors'] for result in results),
+            elapsed
+        )
+        for endpoint in endpoints
+    }
+    summaries['total'] = summarize(
+        [latency for result in results for endpoint in endpoints
+         for latency in result[endpoint]['latencies']],
+        sum(result[endpoint]['errors']
+            for result in results for endpoint in endpoints),
+        elapsed
+    )
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--token', help='bearer token with play:quiz')
+    parser.add_argument(
+        '--endpoints', default=','.join(ENDPOINTS),
+        help='comma separated endpoints of the mix'
+    )
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--pages', type=int, default=100,
+                        help='highest question page requested')
+    parser.add_argument('--categories', type=int, default=6,
+                        help='highest category id requested')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--compare', help='results JSON of an earlier run')
+    args = parser.parse_args()
+
+    endpoints = args.endpoints.split(',')
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f'unknown endpoints: {", ".join(sorted(unknown))}')
+
+    summaries = run(
+        args.url, endpoints, args.token, args.concurrency, args.duration,
+        {'pages': args.pages, 'categories': args.categories,
+         'timeout': args.timeout}
+    )
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['endpoints']
+
+    print(f'{args.concurrency} clients for {args.duration:g} s '
+          f'against {args.url}')
+    for endpoint, summary in summaries.items():
+        line = (
+            f'{endpoint:<20} {summary["throughput"]:8.1f} req/s  '
+            f'p50 {summary["p50_ms"]:7.1f}  p95 {summary["p95_ms"]:7.1f}  '
+            f'p99 {summary["p99_ms"]:7.1f} ms  errors {summary["errors"]}'
+        )
+        before = baseline.get(endpoint, {}).get('p95_ms')
+        if before and summary['p95_ms']:
+            line += f'  p95 x{before / summary["p95_ms"]:.2f}'
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({
+                'url': args.url,
+                'concurrency': args.concurrency,
+                'duration': args.duration,
+                'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'endpoints': summaries,
+            }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
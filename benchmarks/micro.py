@@ -0,0 +1,190 @@
+"""
+Time the hot functions of the api on a synthetic dataset.
+
+Fills the database with ``--questions`` questions (see ``benchmarks.datagen``)
+and times question listing, formatting, quiz draws and token verification
+against a local signing key, without a server in between. Results can be
+saved with ``--output`` and compared with an earlier run with ``--compare``.
+
+Usage::
+
+    python -m benchmarks.micro --questions 100000 --output before.json
+    python -m benchmarks.micro --questions 100000 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import timeit
+
+
+def time_call(function, repeat, number):
+    """
+    Return the best and median time of a call in microseconds.
+
+    :param function:
+    :param repeat:
+    :param number: calls per repeat.
+    :return:
+    """
+    timings = [
+        timing / number * 1e6
+        for timing in timeit.repeat(function, repeat=repeat, number=number)
+    ]
+    return {'best_us': min(timings), 'median_us': statistics.median(timings)}
+
+
+def get_benchmarks(db, questions, token):
+    """
+    Return the benchmarked callables by name.
+
+    :param db:
+    :param questions: number of questions in the database.
+    :param token: token signed by the key of the JWKS stand-in.
+    :return:
+    """
+    from flaskr.auth import get_verified_payload, verify_decode_jwt
+    from flaskr.quiz import question_pool
+    from flaskr.utils import get_question, get_questions_list
+    from models import Question, get_data_version
+
+    middle_page = max(1, questions // 20)
+    middle_id = db.session.query(Question.id).order_by(Question.id).offset(
+        questions // 2
+    ).limit(1).scalar() or 0
+    entities = Question.query.order_by(Question.id).limit(1000).all()
+    version = get_data_version()
+    previous_questions = question_pool.get_ids(1, version)[:20]
+
+    def quiz_draw():
+        question_id = question_pool.draw(1, version, previous_questions)
+        return get_question(question_id)
+
+    def quiz_pool_load():
+        question_pool.clear()
+        return question_pool.get_ids(1, version)
+
+    return {
+        'get_questions_list_first_page': lambda: get_questions_list(page=1),
+        'get_questions_list_middle_page':
+            lambda: get_questions_list(page=middle_page),
+        'get_questions_list_after_cursor':
+            lambda: get_questions_list(after=middle_id),
+        'get_questions_list_category':
+            lambda: get_questions_list(category_id=1),
+        'get_questions_list_search':
+            lambda: get_questions_list(page=1, query='river'),
+        'question_format_1000':
+            lambda: [question.format() for question in entities],
+        'quiz_draw': quiz_draw,
+        'quiz_pool_load': quiz_pool_load,
+        'verify_decode_jwt': lambda: verify_decode_jwt(token),
+        'get_verified_payload_cached': lambda: get_verified_payload(token),
+    }
+
+
+def get_git_revision():
+    """
+    Return the commit of the working tree, if any.
+
+    :return:
+    """
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(database_url, questions, repeat, number, selected=None):
+    """
+    Return the timings of every benchmark with the run metadata.
+
+    :param database_url:
+    :param questions:
+    :param repeat:
+    :param number: calls per repeat.
+    :param selected: names of the benchmarks to run, all by default.
+    :return:
+    """
+    from benchmarks.datagen import generate
+    from benchmarks.signing import sign_token, write_jwks
+
+    jwks_path = os.path.join(tempfile.gettempdir(), 'trivia_bench_jwks.json')
+    private_key = write_jwks(jwks_path)
+    # Must be set before flaskr is imported, it creates the JWKS cache then.
+    os.environ['JWKS_URL'] = f'file://{jwks_path}'
+    token = sign_token(private_key, ['play:quiz'])
+
+    from flaskr import create_app
+    from models import db
+
+    app = create_app({'DATABASE_URL': database_url})
+    results = {}
+    with app.test_request_context():
+        generate(db, questions)
+        benchmarks = get_benchmarks(db, questions, token)
+        for name, function in benchmarks.items():
+            if selected and name not in selected:
+                continue
+            results[name] = time_call(function, repeat, number)
+        dialect = db.engine.dialect.name
+
+    return {
+        'questions': questions,
+        'database': dialect,
+        'python': platform.python_version(),
+        'revision': get_git_revision(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--database-url',
+        default=os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(
+            tempfile.gettempdir(), 'trivia_bench.db'
+        )
+    )
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20)
+    parser.add_argument('--only', action='append',
+                        help='run only the named benchmark')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--compare', help='results JSON of an earlier run')
+    args = parser.parse_args()
+
+    report = run(
+        args.database_url, args.questions, args.repeat, args.number,
+        selected=args.only
+    )
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)['results']
+
+    print(f'{report["questions"]} questions on {report["database"]}, '
+          f'python {report["python"]}')
+    for name, timing in report['results'].items():
+        line = (f'{name:<32} best {timing["best_us"]:11.1f} us  '
+                f'median {timing["median_us"]:11.1f} us')
+        if name in baseline:
+            line += f'  x{baseline[name]["best_us"] / timing["best_us"]:.2f}'
+        print(line)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Compare the ORM read path with the column projection read path.
+
+Times loading ``--limit`` questions as ORM entities formatted with
+``Question.format`` against plain column tuples formatted with
+``format_question_row``, each serialized with the stdlib encoder and with
+the fast encoder of ``flaskr.responses`` (orjson when installed).
+
+Usage::
+
+    python -m benchmarks.serialization --rows 100000 --limit 10000
+"""
+import argparse
+import json
+import os
+import tempfile
+import timeit
+
+
+def run(rows, limit, repeat, number):
+    """
+    Return the best time in milliseconds of every read path.
+
+    :param rows: questions in the table.
+    :param limit: questions read per call.
+    :param repeat:
+    :param number: calls per repeat.
+    :return:
+    """
+    from benchmarks.datagen import generate
+    from flaskr import app
+    from flaskr.responses import dumps, orjson
+    from flaskr.utils import format_question_row, select_questions
+    from models import db, Question
+
+    with app.app_context():
+        generate(db, rows)
+
+        def orm_rows():
+            return [
+                question.format() for question in
+                Question.query.order_by(Question.id).limit(limit)
+            ]
+
+        def projection_rows():
+            return [
+                format_question_row(row) for row in
+                select_questions().order_by(Question.id).limit(limit)
+            ]
+
+        paths = {
+            'orm_stdlib_json': lambda: json.dumps(orm_rows()),
+            'orm_fast_json': lambda: dumps(orm_rows()),
+            'projection_stdlib_json': lambda: json.dumps(projection_rows()),
+            'projection_fast_json': lambda: dumps(projection_rows()),
+        }
+
+        results = {}
+        for name, path in paths.items():
+            db.session.expunge_all()
+            timings = timeit.repeat(path, repeat=repeat, number=number)
+            results[name] = min(timings) / number * 1000
+
+    return {
+        'rows': rows,
+        'limit': limit,
+        'fast_encoder': 'orjson' if orjson is not None else 'json',
+        'best_ms': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--database-url',
+        default='sqlite:///' + os.path.join(
+            tempfile.gettempdir(), 'trivia_serialization_bench.db'
+        )
+    )
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--limit', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=3)
+    args = parser.parse_args()
+
+    # Must be set before flaskr is imported, it binds the database then.
+    os.environ['DATABASE_URL'] = args.database_url
+    results = run(args.rows, args.limit, args.repeat, args.number)
+
+    print(f'{results["limit"]} of {results["rows"]} questions, '
+          f'fast encoder: {results["fast_encoder"]}')
+    baseline = results['best_ms']['orm_stdlib_json']
+    for name, best_ms in results['best_ms'].items():
+        print(f'{name:<24} {best_ms:9.2f} ms  x{baseline / best_ms:.2f}')
+
+
+if __name__ == '__main__':
+    main()
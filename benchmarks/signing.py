@@ -0,0 +1,93 @@
+"""
+Sign tokens with a local key standing in for Auth0.
+
+Writes the JWKS document of a fresh RSA key and prints a token with the
+given permissions. Start the server with ``JWKS_URL`` pointing to the
+document to load test the authenticated routes without Auth0.
+
+Usage::
+
+    python -m benchmarks.signing --jwks /tmp/jwks.json --permission play:quiz
+    JWKS_URL=file:///tmp/jwks.json gunicorn flaskr:app
+"""
+import argparse
+import base64
+import json
+import os
+import time
+
+from Crypto.PublicKey import RSA
+from jose import jwt
+
+KID = 'benchmark'
+
+
+def b64_encode(number):
+    """
+    Base64url encode an integer the way JWKS documents do.
+
+    :param number:
+    :return:
+    """
+    data = number.to_bytes((number.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def write_jwks(path):
+    """
+    Generate a signing key and write its JWKS document to path.
+
+    :param path:
+    :return: the private key in PEM format.
+    """
+    key = RSA.generate(2048)
+    with open(path, 'w') as file:
+        json.dump({'keys': [{
+            'kty': 'RSA',
+            'kid': KID,
+            'use': 'sig',
+            'n': b64_encode(key.n),
+            'e': b64_encode(key.e)
+        }]}, file)
+    return key.export_key().decode()
+
+
+def sign_token(private_key, permissions, expires_in=3600, subject='bench'):
+    """
+    Return a token the api accepts once it trusts the key.
+
+    :param private_key: PEM returned by write_jwks.
+    :param permissions:
+    :param expires_in: seconds.
+    :param subject:
+    :return:
+    """
+    from flaskr.auth import API_AUDIENCE, AUTH0_DOMAIN
+
+    now = int(time.time())
+    return jwt.encode({
+        'iss': f'https://{AUTH0_DOMAIN}/',
+        'aud': API_AUDIENCE,
+        'sub': subject,
+        'iat': now,
+        'exp': now + expires_in,
+        'permissions': permissions,
+    }, private_key, algorithm='RS256', headers={'kid': KID})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--jwks', required=True,
+                        help='path of the JWKS document to write')
+    parser.add_argument('--permission', action='append', default=[],
+                        dest='permissions')
+    parser.add_argument('--expires-in', type=int, default=3600)
+    args = parser.parse_args()
+
+    private_key = write_jwks(args.jwks)
+    print(f'JWKS_URL=file://{os.path.abspath(args.jwks)}')
+    print(sign_token(private_key, args.permissions, args.expires_in))
+
+
+if __name__ == '__main__':
+    main()
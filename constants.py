@@ -7,10 +7,13 @@ class StatusCode(Enum):
     HTTP_200_OK = 200
     HTTP_201_CREATED = 201
     HTTP_204_NO_CONTENT = 204
+    HTTP_304_NOT_MODIFIED = 304
     HTTP_400_BAD_REQUEST = 400
     HTTP_401_UNAUTHORIZED = 401
     HTTP_403_FORBIDDEN = 403
     HTTP_404_NOT_FOUND = 404
     HTTP_405_METHOD_NOT_ALLOWED = 405
     HTTP_422_UNPROCESSABLE_ENTITY = 422
+    HTTP_429_TOO_MANY_REQUESTS = 429
     HTTP_500_INTERNAL_SERVER_ERROR = 500
+    HTTP_503_SERVICE_UNAVAILABLE = 503
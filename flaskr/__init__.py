@@ -1,23 +1,48 @@
-import random
 import os
+import random
+from array import array
 
-from flask import Flask, request, abort, jsonify
-from flask_sqlalchemy import SQLAlchemy
+from flask import (
+    Blueprint, Flask, Response, request, abort, jsonify, stream_with_context
+)
 from flask_cors import CORS
 
 from constants import StatusCode
-from models import setup_db, Question, Category
+from models import db, setup_db, get_data_version, Question
 from .auth import requires_auth, AuthError
-from .utils import get_questions_list
+from .bulk import (
+    BULK_BATCH_SIZE, EXPORT_FORMATS, MAX_BULK_BATCH_SIZE, NDJSON_MIMETYPES,
+    delete_questions, get_questions_condition, insert_questions, iter_chunks,
+    iter_csv_export, iter_ndjson, iter_ndjson_export, iter_question_rows,
+    update_questions, validate_question
+)
+from .cache import response_cache
+from .compression import compress_response
+from .limits import LimitExceeded
+from .metrics import generate_metrics, record_request, start_request
+from .quiz import QUIZ_MAX_COUNT, question_pool
+from .responses import JSONResponse
+from .sessions import session_store, SessionNotFound
+from .utils import (
+    conditional, get_questions_list, get_next_cursor, get_cache_key,
+    get_categories_map, get_category_counts, get_includes, get_question,
+    get_question_columns, get_questions_by_ids, get_quiz_category_id,
+    get_request_data_version, read_only, record_write
+)
+
+api = Blueprint('api', __name__)
+QUESTIONS_PER_PAGE = 10
 
-app = Flask(__name__)
-setup_db(app)
 
-CORS(app, resources={r"*": {"origins": "*"}})
-QUESTIONS_PER_PAGE = 10
+@api.before_app_request
+def before_request():
+    """
+    Handler for before a request is dispatched.
+    """
+    start_request()
 
 
-@app.after_request
+@api.after_app_request
 def after_request(response):
     """
     Handler for after a request has been made.
@@ -26,92 +51,221 @@ def after_request(response):
     """
     response.headers.add(
         'Access-Control-Allow-Headers',
-        'Content-Type, Authorization'
+        'Content-Type, Authorization, X-Data-Version'
     )
+    response.headers.add('Access-Control-Expose-Headers', 'X-Data-Version')
     response.headers.add(
         'Access-Control-Allow-Methods',
         'GET, POST, PUT, PATCH, DELETE, OPTIONS'
     )
+    record_write(response)
+    response = compress_response(response)
+    record_request(response)
     return response
 
 
-@app.route('/categories')
+@api.route('/categories')
+@read_only
+@conditional
 def get_categories():
     """
     Return the categories with id and type.
 
+    ``?with_counts=true`` adds the number of questions of every category.
+
     :return:
     """
+    with_counts = request.args.get('with_counts', '').lower() \
+        in ('1', 'true', 'yes')
     try:
+        categories = get_categories_map()
         result = {
             "success": True,
-            "categories": {
-                category.id: category.type \
-                    for category in Category.query.all()
-            }
+            "categories": categories
         }
-        return jsonify(result)
+        if with_counts:
+            counts = get_category_counts()
+            result['counts'] = {
+                category_id: counts.get(category_id, 0)
+                for category_id in categories
+            }
+            result['total_questions'] = sum(counts.values())
+        return JSONResponse(result)
     except Exception:
         abort(StatusCode.HTTP_400_BAD_REQUEST.value)
 
 
-@app.route('/questions')
+@api.route('/questions')
+@read_only
+@conditional
 def get_questions():
     """
-    Get questions for a given page.
+    Get questions for a given page or after a given question id.
+
+    ``?fields=`` limits the question fields and ``?include=`` the embedded
+    categories, which are included by default.
 
     :return:
     """
     page = request.args.get('page', 1, type=int)
-    questions, total_questions_count = get_questions_list(page=page)
+    after = request.args.get('after', None, type=int)
+    try:
+        columns = get_question_columns()
+        includes = get_includes(default=('categories',))
+    except ValueError:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    questions, total_questions_count = response_cache.get_or_set(
+        get_cache_key(
+            'questions', page=('after', after) if after is not None else page,
+            columns=columns
+        ),
+        lambda: get_questions_list(page=page, after=after, columns=columns)
+    )
 
     if len(questions) == 0:
         abort(StatusCode.HTTP_404_NOT_FOUND.value)
 
     try:
-        categories = {
-            category.id: category.type for category in Category.query.all()
-        }
+        result = {'success': True, 'current_category': None}
+        if 'categories' in includes:
+            result['categories'] = get_categories_map()
+        result.update({
+            'questions': questions,
+            'total_questions': total_questions_count,
+            'next_cursor': get_next_cursor(questions)
+        })
+        return JSONResponse(result)
+    except Exception:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
 
-        return jsonify({
+
+@api.route('/questions/search', methods=['POST'])
+@read_only
+def search_questions():
+    """
+    Search questions by the search term, ranked and paginated.
+
+    ``?fields=`` limits the question fields.
+
+    :return:
+    """
+    request_data = request.get_json()
+    search_term = request_data.get('searchTerm') if request_data else None
+
+    if not search_term or not isinstance(search_term, str):
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    try:
+        page = int(request_data.get('page', 1))
+    except (TypeError, ValueError):
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+    if page < 1:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    try:
+        category_id = request_data.get('category')
+        questions, total_questions_count = get_questions_list(
+            page=page,
+            query=search_term,
+            category_id=int(category_id) if category_id else None,
+            columns=get_question_columns()
+        )
+        return JSONResponse({
             'success': True,
-            'current_category': None,
-            'categories': categories,
             'questions': questions,
-            'total_questions': total_questions_count
+            'total_questions': total_questions_count,
+            'current_category': category_id
         })
     except Exception:
         abort(StatusCode.HTTP_400_BAD_REQUEST.value)
 
 
-@app.route('/categories/<int:category_id>/questions')
+@api.route('/questions/export')
+@read_only
+@requires_auth('get:questions')
+def export_questions(token):
+    """
+    Stream all the questions, optionally filtered, as NDJSON or CSV.
+
+    :return:
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    rows = iter_question_rows(
+        category_id=request.args.get('category', None, type=int),
+        difficulty=request.args.get('difficulty', None, type=int),
+        after=request.args.get('after', None, type=int)
+    )
+
+    if export_format == 'csv':
+        lines, mimetype = iter_csv_export(rows), 'text/csv'
+    else:
+        lines, mimetype = iter_ndjson_export(rows), 'application/x-ndjson'
+
+    return Response(
+        stream_with_context(iter_chunks(lines)),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition':
+                f'attachment; filename=questions.{export_format}'
+        }
+    )
+
+
+@api.route('/categories/<int:category_id>/questions')
+@read_only
+@conditional
 def get_questions_by_category(category_id):
     """
     Get questions by category.
 
+    ``?fields=`` limits the question fields and ``?include=categories``
+    embeds the categories.
+
     :param category_id:
     :return:
     """
-    category = Category.query.get(category_id)
+    categories = get_categories_map()
 
-    if not category:
+    if category_id not in categories:
         abort(StatusCode.HTTP_404_NOT_FOUND.value)
 
     try:
-        questions, total_questions_count = get_questions_list(
-            category_id=category_id
+        columns = get_question_columns()
+        includes = get_includes()
+    except ValueError:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    try:
+        questions, total_questions_count = response_cache.get_or_set(
+            get_cache_key(
+                'category_questions', category_id=category_id,
+                columns=columns
+            ),
+            lambda: get_questions_list(
+                category_id=category_id, columns=columns
+            )
         )
-        return jsonify({
+        result = {
             "success": True,
             "questions": questions,
             "total_questions": total_questions_count,
-            "current_category": category.format(),
-        })
+            "current_category": {
+                'id': category_id,
+                'type': categories[category_id]
+            },
+        }
+        if 'categories' in includes:
+            result['categories'] = categories
+        return JSONResponse(result)
     except Exception:
         abort(StatusCode.HTTP_400_BAD_REQUEST.value)
 
 
-@app.route('/questions/<int:question_id>', methods=['DELETE'])
+@api.route('/questions/<int:question_id>', methods=['DELETE'])
 @requires_auth('delete:question')
 def delete_question(token, question_id):
     """
@@ -133,7 +287,7 @@ def delete_question(token, question_id):
         abort(StatusCode.HTTP_400_BAD_REQUEST.value)
 
 
-@app.route('/questions/<int:question_id>', methods=['PATCH'])
+@api.route('/questions/<int:question_id>', methods=['PATCH'])
 @requires_auth('edit:question')
 def edit_question(token, question_id):
     """
@@ -162,7 +316,55 @@ def edit_question(token, question_id):
         abort(StatusCode.HTTP_400_BAD_REQUEST.value)
 
 
-@app.route('/questions', methods=['POST'])
+@api.route('/questions', methods=['DELETE'])
+@requires_auth('delete:question')
+def delete_questions_bulk(token):
+    """
+    Delete the questions matching given ids or category/difficulty filter.
+
+    :param token:
+    :return:
+    """
+    try:
+        condition = get_questions_condition(request.get_json())
+    except Exception:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    try:
+        question_ids = delete_questions(condition)
+        return jsonify({
+            'success': True, 'ids': question_ids, 'count': len(question_ids)
+        })
+    except Exception:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+
+@api.route('/questions', methods=['PATCH'])
+@requires_auth('edit:question')
+def edit_questions_bulk(token):
+    """
+    Update the questions matching given ids or category/difficulty filter.
+
+    :param token:
+    :return:
+    """
+    try:
+        request_data = request.get_json()
+        condition = get_questions_condition(request_data)
+        changes = validate_question(request_data.get('changes'), partial=True)
+    except Exception:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    try:
+        question_ids = update_questions(condition, changes)
+        return jsonify({
+            'success': True, 'ids': question_ids, 'count': len(question_ids)
+        })
+    except Exception:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+
+@api.route('/questions', methods=['POST'])
 @requires_auth('add:question')
 def add_question(token):
     """
@@ -186,41 +388,194 @@ def add_question(token):
         abort(StatusCode.HTTP_400_BAD_REQUEST.value)
 
 
-@app.route('/quizzes', methods=['POST'])
+@api.route('/questions/bulk', methods=['POST'])
+@requires_auth('add:question')
+def add_questions_bulk(token):
+    """
+    Add questions in batches from a JSON array or an NDJSON stream.
+
+    :return:
+    """
+    batch_size = request.args.get('batch_size', BULK_BATCH_SIZE, type=int)
+    if not 0 < batch_size <= MAX_BULK_BATCH_SIZE:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    if request.mimetype in NDJSON_MIMETYPES:
+        rows = iter_ndjson(request.stream)
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    try:
+        results = insert_questions(rows, batch_size=batch_size)
+        inserted = sum(1 for result in results if result['success'])
+
+        return jsonify({
+            'success': True,
+            'inserted': inserted,
+            'failed': len(results) - inserted,
+            'results': results
+        })
+    except Exception:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+
+@api.route('/quizzes', methods=['POST'])
+@read_only
 @requires_auth('play:quiz')
 def play_quiz(token):
     """
     Play quiz route to get questions for quizzes.
 
+    With ``count`` up to ``QUIZ_MAX_COUNT`` distinct questions are drawn at
+    once and returned in ``questions``.
+
     :return:
     """
+    request_data = request.get_json()
+    if not isinstance(request_data, dict):
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    if request_data.get('session_id'):
+        return play_quiz_session(request_data['session_id'])
+
     try:
-        request_data = request.get_json()
         previous_questions = request_data.get('previous_questions', [])
         quiz_category = request_data.get('quiz_category')
+        count = request_data.get('count')
 
-        if not quiz_category:
+        if not quiz_category or (count is not None and int(count) < 1):
             abort(StatusCode.HTTP_400_BAD_REQUEST.value)
 
-        category_id = quiz_category.get('id', None)
-        questions, _ = get_questions_list(category_id=category_id)
+        category_id = get_quiz_category_id(quiz_category)
+        if count is None:
+            question_id = question_pool.draw(
+                category_id, get_request_data_version(), previous_questions
+            )
+            random_question = get_question(question_id) \
+                if question_id else None
+
+            return JSONResponse({
+                'question': random_question, 'success': True
+            })
+
+        questions = get_questions_by_ids(question_pool.sample(
+            category_id, get_request_data_version(),
+            min(int(count), QUIZ_MAX_COUNT), previous_questions
+        ))
+        return JSONResponse({
+            'question': questions[0] if questions else None,
+            'questions': questions,
+            'success': True
+        })
+    except Exception:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+
+def play_quiz_session(session_id):
+    """
+    Return the next question of given quiz session.
+
+    :param session_id:
+    :return:
+    """
+    question = None
+    while not question:
+        try:
+            question_id = session_store.advance(session_id)
+        except SessionNotFound:
+            abort(StatusCode.HTTP_404_NOT_FOUND.value)
 
-        filtered_questions = [
-            question for question in questions \
-                if question.get('id') not in previous_questions
-        ]
+        if question_id is None:
+            break
+        # Questions deleted since the session was created are skipped.
+        question = get_question(question_id)
 
-        random_question = random.choice(filtered_questions) \
-            if filtered_questions else None
+    return JSONResponse({
+        'question': question, 'success': True
+    })
+
+
+@api.route('/quizzes/sessions', methods=['POST'])
+@read_only
+@requires_auth('play:quiz')
+def create_quiz_session(token):
+    """
+    Create a quiz session holding a shuffled permutation of the questions.
+
+    :return:
+    """
+    request_data = request.get_json()
+    quiz_category = request_data.get('quiz_category') \
+        if isinstance(request_data, dict) else None
+
+    if not quiz_category:
+        abort(StatusCode.HTTP_400_BAD_REQUEST.value)
+
+    try:
+        question_ids = array('l', question_pool.get_ids(
+            get_quiz_category_id(quiz_category), get_request_data_version()
+        ))
+        random.shuffle(question_ids)
+        session_id = session_store.create(question_ids)
 
         return jsonify({
-            'question': random_question, 'success': True
-        })
+            'success': True,
+            'session_id': session_id,
+            'total_questions': len(question_ids)
+        }), StatusCode.HTTP_201_CREATED.value
     except Exception:
         abort(StatusCode.HTTP_400_BAD_REQUEST.value)
 
 
-@app.errorhandler(StatusCode.HTTP_400_BAD_REQUEST.value)
+@api.route('/healthz')
+def healthz():
+    """
+    Health check reporting whether the database can be reached.
+
+    The data version is read so a database whose migrations have not been
+    run fails the check too.
+
+    :return:
+    """
+    try:
+        get_data_version()
+        return jsonify({'success': True, 'database': 'ok'})
+    except Exception:
+        db.session.rollback()
+        return jsonify({
+            'success': False, 'database': 'unavailable'
+        }), StatusCode.HTTP_503_SERVICE_UNAVAILABLE.value
+
+
+@api.route('/debug/pool')
+@requires_auth('get:debug')
+def debug_pool(token):
+    """
+    Report the connection pool usage of this worker to size pools from data.
+
+    :return:
+    """
+    pool = db.engine.pool
+    stats = pool.stats() if hasattr(pool, 'stats') else {}
+    stats.update(pool_class=type(pool).__name__, status=pool.status())
+
+    return jsonify({'success': True, 'pool': stats})
+
+
+@api.route('/metrics')
+def metrics():
+    """
+    Expose the request, SQL, token and cache metrics of all workers.
+
+    :return:
+    """
+    data, content_type = generate_metrics()
+    return Response(data, content_type=content_type)
+
+
+@api.app_errorhandler(StatusCode.HTTP_400_BAD_REQUEST.value)
 def bad_request(error):
     """
     Error handler for bad request with status code 400.
@@ -235,7 +590,7 @@ def bad_request(error):
     }), StatusCode.HTTP_400_BAD_REQUEST.value
 
 
-@app.errorhandler(StatusCode.HTTP_401_UNAUTHORIZED.value)
+@api.app_errorhandler(StatusCode.HTTP_401_UNAUTHORIZED.value)
 def unauthorized(error):
     """
     Error handler for unauthorized with status code 401.
@@ -250,7 +605,7 @@ def unauthorized(error):
     }), StatusCode.HTTP_401_UNAUTHORIZED.value
 
 
-@app.errorhandler(StatusCode.HTTP_403_FORBIDDEN.value)
+@api.app_errorhandler(StatusCode.HTTP_403_FORBIDDEN.value)
 def forbidden(error):
     """
     Error handler for forbidden with status code 403.
@@ -265,7 +620,7 @@ def forbidden(error):
     }), StatusCode.HTTP_403_FORBIDDEN.value
 
 
-@app.errorhandler(StatusCode.HTTP_404_NOT_FOUND.value)
+@api.app_errorhandler(StatusCode.HTTP_404_NOT_FOUND.value)
 def not_found(error):
     """
     Error handler for not found with status code 404.
@@ -280,7 +635,7 @@ def not_found(error):
     }), StatusCode.HTTP_404_NOT_FOUND.value
 
 
-@app.errorhandler(StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value)
+@api.app_errorhandler(StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value)
 def method_not_allowed(error):
     """
     Error handler for method not allowed with status code 405.
@@ -295,7 +650,7 @@ def method_not_allowed(error):
     }), StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
 
 
-@app.errorhandler(StatusCode.HTTP_422_UNPROCESSABLE_ENTITY.value)
+@api.app_errorhandler(StatusCode.HTTP_422_UNPROCESSABLE_ENTITY.value)
 def unprocessable_entity(error):
     """
     Error handler for unprocessable entity with status code 422.
@@ -310,7 +665,22 @@ def unprocessable_entity(error):
     }), StatusCode.HTTP_422_UNPROCESSABLE_ENTITY.value
 
 
-@app.errorhandler(StatusCode.HTTP_500_INTERNAL_SERVER_ERROR.value)
+@api.app_errorhandler(StatusCode.HTTP_429_TOO_MANY_REQUESTS.value)
+def too_many_requests(error):
+    """
+    Error handler for too many requests with status code 429.
+
+    :param: error
+    :return:
+    """
+    return jsonify({
+        'success': False,
+        'error': StatusCode.HTTP_429_TOO_MANY_REQUESTS.value,
+        'message': StatusCode.HTTP_429_TOO_MANY_REQUESTS.name
+    }), StatusCode.HTTP_429_TOO_MANY_REQUESTS.value
+
+
+@api.app_errorhandler(StatusCode.HTTP_500_INTERNAL_SERVER_ERROR.value)
 def internal_server_error(error):
     """
     Error handler for internal server error with status code 500.
@@ -325,7 +695,22 @@ def internal_server_error(error):
     }), StatusCode.HTTP_500_INTERNAL_SERVER_ERROR.value
 
 
-@app.errorhandler(AuthError)
+@api.app_errorhandler(StatusCode.HTTP_503_SERVICE_UNAVAILABLE.value)
+def service_unavailable(error):
+    """
+    Error handler for service unavailable with status code 503.
+
+    :param: error
+    :return:
+    """
+    return jsonify({
+        'success': False,
+        'error': StatusCode.HTTP_503_SERVICE_UNAVAILABLE.value,
+        'message': StatusCode.HTTP_503_SERVICE_UNAVAILABLE.name
+    }), StatusCode.HTTP_503_SERVICE_UNAVAILABLE.value
+
+
+@api.app_errorhandler(AuthError)
 def auth_error(error):
     """
     Error handling for our custom auth error class.
@@ -334,3 +719,47 @@ def auth_error(error):
     :return:
     """
     return jsonify(error.error), error.status_code
+
+
+@api.app_errorhandler(LimitExceeded)
+def limit_exceeded(error):
+    """
+    Error handling for requests shed by the admission control.
+
+    :param error:
+    :return:
+    """
+    return jsonify({
+        'success': False,
+        'error': error.status_code,
+        'message': StatusCode(error.status_code).name
+    }), error.status_code, {'Retry-After': str(error.retry_after)}
+
+
+def create_app(config=None):
+    """
+    Create the flask application serving the trivia api.
+
+    No database connection is opened and no DDL is issued here, the engines
+    are created on the first query. So the app can be imported by every
+    worker, test and command for free, and forked by ``gunicorn --preload``.
+
+    :param config: optional settings, ``DATABASE_URL`` and
+        ``READ_REPLICA_URL`` default to the env variables of the same name.
+    :return:
+    """
+    config = dict(config or {})
+    app = Flask(__name__)
+    app.config.from_mapping(config)
+    setup_db(
+        app,
+        config.get('DATABASE_URL', os.environ.get('DATABASE_URL')),
+        config.get('READ_REPLICA_URL', os.environ.get('READ_REPLICA_URL'))
+    )
+
+    CORS(app, resources={r"*": {"origins": "*"}})
+    app.register_blueprint(api)
+    return app
+
+
+app = create_app()
@@ -1,15 +1,34 @@
+import hashlib
 import json
+import os
+import threading
+import time
 from flask import request, _request_ctx_stack, abort
 from functools import wraps
-from jose import jwt
+from jose import jwk, jwt
 from urllib.request import urlopen
 
 from constants import StatusCode
+from .cache import LRUCache
+from .limits import get_admission
+from .metrics import JWT_VERIFY_DURATION
 
-AUTH0_DOMAIN = 'udacityfsnd.auth0.com'
+AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN', 'udacityfsnd.auth0.com')
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'capstone'
 
+# ``JWKS_URL`` accepts any url understood by ``urlopen``, so a local
+# ``file://`` path or a stand-in server can serve the keys.
+JWKS_URL = os.environ.get(
+    'JWKS_URL', f'https://{AUTH0_DOMAIN}/.well-known/jwks.json'
+)
+JWKS_CACHE_TTL = int(os.environ.get('JWKS_CACHE_TTL', 600))
+JWKS_MIN_REFRESH_INTERVAL = int(
+    os.environ.get('JWKS_MIN_REFRESH_INTERVAL', 30)
+)
+JWKS_FETCH_TIMEOUT = int(os.environ.get('JWKS_FETCH_TIMEOUT', 5))
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', 4096))
+
 
 class AuthError(Exception):
     '''A standardized way to communicate auth failure modes'''
@@ -26,6 +45,129 @@ class AuthError(Exception):
         self.status_code = status_code
 
 
+class JWKSCache:
+    """
+    Process wide cache of the signing keys published by the identity provider.
+
+    Keys are kept as pre-built key objects per ``kid`` and refreshed once the
+    TTL has passed or when an unknown ``kid`` shows up. Only one thread
+    fetches at a time, the others wait for its result. If the endpoint is
+    down the keys fetched last are served until it comes back.
+    """
+
+    def __init__(
+        self, url, ttl=JWKS_CACHE_TTL,
+        min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL,
+        timeout=JWKS_FETCH_TIMEOUT
+    ):
+        """
+        Constructor for JWKSCache
+
+        :param url: url of the JWKS document.
+        :param ttl: seconds after which the keys are refreshed.
+        :param min_refresh_interval: minimum seconds between two fetches,
+            bounds refreshes forced by unknown kids and retries on failure.
+        :param timeout: timeout in seconds of a single fetch.
+        """
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self._keys = {}
+        self._fetched_at = None
+        self._attempted_at = None
+        self._lock = threading.Lock()
+
+    def get_key(self, kid):
+        """
+        Return the key object for given kid or None if it is unknown.
+
+        :param kid:
+        :return:
+        """
+        if self._is_expired():
+            self.refresh()
+
+        key = self._keys.get(kid)
+        if key is None and self._can_refresh():
+            self.refresh(force=True)
+            key = self._keys.get(kid)
+
+        return key
+
+    def refresh(self, force=False):
+        """
+        Fetch the keys again, serving the previous ones if the fetch fails.
+
+        :param force: refresh even if the keys have not expired yet.
+        """
+        attempted_at = self._attempted_at
+        with self._lock:
+            if self._attempted_at != attempted_at:
+                # Another thread fetched while this one was waiting.
+                return
+            if not (force or self._is_expired()):
+                return
+
+            self._attempted_at = time.monotonic()
+            try:
+                self._keys = self._fetch_keys()
+                self._fetched_at = self._attempted_at
+            except Exception:
+                if not self._keys:
+                    raise
+
+    def clear(self):
+        """
+        Drop all cached keys.
+        """
+        with self._lock:
+            self._keys = {}
+            self._fetched_at = None
+            self._attempted_at = None
+
+    def _fetch_keys(self):
+        """
+        Download the JWKS document and build a key object per kid.
+
+        :return: dict of kid to key object.
+        """
+        with urlopen(self.url, timeout=self.timeout) as json_url:
+            jwks = json.loads(json_url.read())
+
+        return {
+            key['kid']: jwk.construct({
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key['use'],
+                'n': key['n'],
+                'e': key['e']
+            }, ALGORITHMS[0])
+            for key in jwks['keys']
+        }
+
+    def _can_refresh(self):
+        return self._attempted_at is None or (
+            time.monotonic() - self._attempted_at
+            >= self.min_refresh_interval
+        )
+
+    def _is_expired(self):
+        if self._fetched_at is None:
+            return self._can_refresh()
+        return (
+            time.monotonic() - self._fetched_at >= self.ttl
+            and self._can_refresh()
+        )
+
+
+jwks_cache = JWKSCache(JWKS_URL)
+
+# Decoded payloads of verified tokens keyed by the token digest, every entry
+# expires together with its token.
+token_cache = LRUCache(TOKEN_CACHE_SIZE, name='token')
+
+
 def raise_auth_error(message, error=StatusCode.HTTP_401_UNAUTHORIZED.value):
     """
     Raise auth error with given message.
@@ -87,19 +229,7 @@ def verify_decode_jwt(token):
     if 'kid' not in unverified_header:
         raise_auth_error('kid missing in header')
 
-    json_url = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(json_url.read())
-    rsa_key = {}
-
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    rsa_key = jwks_cache.get_key(unverified_header['kid'])
 
     if rsa_key:
         try:
@@ -127,13 +257,49 @@ def verify_decode_jwt(token):
     )
 
 
+def get_verified_payload(token):
+    """
+    Return the payload of token, verifying it only if it is not cached yet.
+
+    :param token:
+    :return:
+    """
+    started_at = time.perf_counter()
+    result = 'failed'
+    try:
+        token_digest = hashlib.sha256(token.encode()).hexdigest()
+        payload = token_cache.get(token_digest)
+        if payload is None:
+            payload = verify_decode_jwt(token)
+            if 'exp' in payload:
+                token_cache.set(
+                    token_digest, payload, expires_at=payload['exp']
+                )
+            result = 'verified'
+        else:
+            result = 'cached'
+        return payload
+    finally:
+        JWT_VERIFY_DURATION.labels(result).observe(
+            time.perf_counter() - started_at
+        )
+
+
 def requires_auth(permission=''):
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
+            admission = get_admission(request.endpoint, permission)
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
-            return f(payload, *args, **kwargs)
+            # Shed load before verifying the token, a slow JWKS fetch must
+            # not pile up requests. Clients are only told apart by their
+            # token once it is verified.
+            with admission.admit(request.remote_addr):
+                payload = get_verified_payload(token)
+                admission.admit_client(
+                    payload.get('sub') or request.remote_addr
+                )
+                check_permissions(permission, payload)
+                return f(payload, *args, **kwargs)
         return wrapper
     return requires_auth_decorator
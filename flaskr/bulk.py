@@ -0,0 +1,338 @@
+import csv
+import io
+import json
+import os
+
+from sqlalchemy import and_, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Question, bump_data_version
+from .utils import QUESTION_COLUMNS
+
+
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 1000))
+MAX_BULK_BATCH_SIZE = 10000
+NDJSON_MIMETYPES = (
+    'application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'
+)
+
+QUESTION_FIELDS = ('question', 'answer', 'category', 'difficulty')
+EXPORT_FIELDS = QUESTION_COLUMNS
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+
+def validate_question(data, partial=False):
+    """
+    Validate question data and return the row to insert.
+
+    :param data:
+    :param partial: only validate the fields present in data, as for an
+        update.
+    :return: dict of question fields.
+    :raises ValueError: if the data is not a valid question.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('question should be an object')
+
+    unknown_fields = set(data) - set(QUESTION_FIELDS)
+    if unknown_fields:
+        raise ValueError(
+            f'unknown fields: {", ".join(sorted(unknown_fields))}'
+        )
+    if partial and not data:
+        raise ValueError('no fields to update')
+
+    row = {}
+    for field in ('question', 'answer'):
+        if partial and field not in data:
+            continue
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f'{field} is required')
+        row[field] = value
+
+    for field in ('category', 'difficulty'):
+        if partial and field not in data:
+            continue
+        row[field] = validate_integer(field, data.get(field))
+
+    return row
+
+
+def validate_integer(field, value):
+    """
+    Return value as an integer.
+
+    :param field: name of the field, used in the error message.
+    :param value:
+    :return:
+    :raises ValueError: if value is not an integer.
+    """
+    if isinstance(value, bool):
+        raise ValueError(f'{field} should be an integer')
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} should be an integer')
+
+
+def iter_ndjson(lines):
+    """
+    Parse NDJSON lines, yielding the decoded value or the parsing error.
+
+    :param lines: iterable of str or bytes lines.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as error:
+            yield error
+
+
+def insert_questions(rows, batch_size=BULK_BATCH_SIZE):
+    """
+    Validate rows one by one and insert the valid ones in batches.
+
+    Every batch is inserted with a single statement and committed together
+    with a bump of the data version. If a batch fails its rows are retried
+    one by one within savepoints, so a single bad row only fails itself.
+
+    :param rows: iterable of question data or parsing errors.
+    :param batch_size: number of rows inserted per statement.
+    :return: list of per-row results ordered by row index.
+    """
+    results = []
+    batch = []
+
+    for index, data in enumerate(rows):
+        try:
+            if isinstance(data, Exception):
+                raise ValueError(f'invalid JSON: {data}')
+            batch.append((index, validate_question(data)))
+        except ValueError as error:
+            results.append({'index': index, 'success': False,
+                            'error': str(error)})
+
+        if len(batch) >= batch_size:
+            results.extend(insert_batch(batch))
+            batch = []
+
+    if batch:
+        results.extend(insert_batch(batch))
+
+    return sorted(results, key=lambda result: result['index'])
+
+
+def insert_batch(batch):
+    """
+    Insert a batch of validated rows.
+
+    :param batch: list of (row index, row).
+    :return: list of per-row results.
+    """
+    table = Question.__table__
+    rows = [row for _, row in batch]
+
+    try:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # One multi-row VALUES statement instead of a statement per row.
+            db.session.execute(table.insert().values(rows))
+        else:
+            db.session.execute(table.insert(), rows)
+        bump_data_version()
+        db.session.commit()
+        return [{'index': index, 'success': True} for index, _ in batch]
+    except SQLAlchemyError:
+        db.session.rollback()
+
+    results = []
+    for index, row in batch:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert(), row)
+            results.append({'index': index, 'success': True})
+        except SQLAlchemyError as error:
+            results.append({'index': index, 'success': False,
+                            'error': str(error.orig or error).strip()})
+
+    bump_data_version()
+    db.session.commit()
+    return results
+
+
+def get_questions_condition(data):
+    """
+    Return the condition selecting the questions of a bulk operation.
+
+    :param data: dict with a list of ``ids`` and/or ``category`` and
+        ``difficulty`` values to filter on.
+    :return:
+    :raises ValueError: if no valid filter is given.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('filter should be an object')
+
+    conditions = []
+    ids = data.get('ids')
+    if ids is not None:
+        if not isinstance(ids, list) or not ids:
+            raise ValueError('ids should be a non empty list')
+        conditions.append(Question.id.in_(
+            [validate_integer('ids', question_id) for question_id in ids]
+        ))
+
+    for field in ('category', 'difficulty'):
+        if field in data:
+            value = validate_integer(field, data[field])
+            conditions.append(getattr(Question, field) == value)
+
+    if not conditions:
+        raise ValueError('ids, category or difficulty is required')
+
+    return and_(*conditions)
+
+
+def delete_questions(condition):
+    """
+    Delete the questions matching condition in a single statement.
+
+    :param condition:
+    :return: ids of the deleted questions.
+    """
+    statement = Question.__table__.delete().where(condition)
+    return _execute_bulk(statement, condition)
+
+
+def update_questions(condition, changes):
+    """
+    Update the questions matching condition in a single statement.
+
+    :param condition:
+    :param changes: validated question fields to set.
+    :return: ids of the updated questions.
+    """
+    statement = Question.__table__.update().where(condition).values(changes)
+    return _execute_bulk(statement, condition)
+
+
+def _execute_bulk(statement, condition):
+    """
+    Execute a set based UPDATE or DELETE in one transaction.
+
+    Postgres returns the affected ids from the statement itself, elsewhere
+    they are selected first within the same transaction.
+
+    :param statement:
+    :param condition: condition of statement.
+    :return: ids of the affected questions.
+    """
+    table = Question.__table__
+    try:
+        if db.session.get_bind().dialect.name == 'postgresql':
+            ids = [
+                question_id for question_id, in
+                db.session.execute(statement.returning(table.c.id))
+            ]
+        else:
+            ids = [
+                question_id for question_id, in db.session.execute(
+                    select([table.c.id]).where(condition).order_by(table.c.id)
+                )
+            ]
+            db.session.execute(statement)
+
+        if ids:
+            bump_data_version()
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+    return sorted(ids)
+
+
+def iter_question_rows(
+    category_id=None, difficulty=None, after=None,
+    batch_size=EXPORT_BATCH_SIZE
+):
+    """
+    Yield question rows as plain tuples from a server side cursor.
+
+    Rows are streamed ``batch_size`` at a time so memory stays flat
+    whatever the size of the table.
+
+    :param category_id:
+    :param difficulty:
+    :param after: only export questions with a greater id.
+    :param batch_size: number of rows fetched per round trip.
+    """
+    columns = [getattr(Question, field) for field in EXPORT_FIELDS]
+    query = db.session.query(*columns).order_by(Question.id)
+
+    if category_id is not None:
+        query = query.filter(Question.category == category_id)
+    if difficulty is not None:
+        query = query.filter(Question.difficulty == difficulty)
+    if after is not None:
+        query = query.filter(Question.id > after)
+
+    yield from query.execution_options(stream_results=True) \
+        .yield_per(batch_size)
+
+
+def iter_ndjson_export(rows):
+    """
+    Encode rows as NDJSON lines.
+
+    :param rows: iterable of tuples ordered as ``EXPORT_FIELDS``.
+    """
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+
+def iter_csv_export(rows, header=True):
+    """
+    Encode rows as CSV lines.
+
+    :param rows: iterable of tuples ordered as ``EXPORT_FIELDS``.
+    :param header: start with a line of field names.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if header:
+        writer.writerow(EXPORT_FIELDS)
+
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_chunks(lines, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Group lines into chunks of about chunk_size characters.
+
+    :param lines: iterable of str.
+    :param chunk_size:
+    """
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield ''.join(chunk)
+            chunk = []
+            size = 0
+
+    if chunk:
+        yield ''.join(chunk)
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .metrics import record_cache_lookup
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread safe, size bounded cache evicting the least recently used entry.
+
+    Entries can be given an absolute expiry time after which they are
+    dropped on access. Hits and misses are counted to check the effect of
+    the cache under load, and exported as metrics when the cache is named.
+    """
+
+    def __init__(self, maxsize=1024, name=None):
+        """
+        Constructor for LRUCache
+
+        :param maxsize: maximum number of entries kept.
+        :param name: label of the cache in the metrics.
+        """
+        self.maxsize = maxsize
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value cached for key or default if missing or expired.
+
+        :param key:
+        :param default:
+        :return:
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    self._record_lookup(True)
+                    return value
+                del self._entries[key]
+
+            self.misses += 1
+            self._record_lookup(False)
+            return default
+
+    def get_or_set(self, key, loader, expires_at=None):
+        """
+        Return the value cached for key, loading and caching it if missing.
+
+        :param key:
+        :param loader: callable returning the value to cache.
+        :param expires_at: unix timestamp after which the entry is dropped.
+        :return:
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = loader()
+            self.set(key, value, expires_at=expires_at)
+        return value
+
+    def set(self, key, value, expires_at=None):
+        """
+        Cache value for key.
+
+        :param key:
+        :param value:
+        :param expires_at: unix timestamp after which the entry is dropped.
+        """
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        """
+        Drop the entry cached for key if any.
+
+        :param key:
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Drop all entries and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return size and hit/miss counters of the cache.
+
+        :return:
+        """
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / requests if requests else 0.0
+            }
+
+    def _record_lookup(self, hit):
+        if self.name:
+            record_cache_lookup(self.name, hit)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Data served by the read endpoints keyed by
+# (endpoint, page, category, columns, data version), writes bump the data
+# version so entries of older versions are never served again and age out
+# of the cache.
+response_cache = LRUCache(RESPONSE_CACHE_SIZE, name='response')
@@ -0,0 +1,146 @@
+import os
+import zlib
+
+from flask import request
+
+from constants import StatusCode
+from .cache import LRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+COMPRESSED_CACHE_SIZE = int(os.environ.get('COMPRESSED_CACHE_SIZE', 256))
+COMPRESS_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+# In order of preference when the client accepts several equally.
+ENCODINGS = ('br', 'gzip')
+
+# Compressed bodies of responses with an ETag keyed by (ETag, encoding), an
+# ETag identifies the exact body so entries never need to be invalidated.
+compressed_cache = LRUCache(COMPRESSED_CACHE_SIZE, name='compressed')
+
+
+def get_encoding():
+    """
+    Return the best encoding accepted by the current request, if any.
+
+    :return:
+    """
+    accept_encodings = request.accept_encodings
+    encodings = [
+        encoding for encoding in ENCODINGS
+        if encoding != 'br' or brotli is not None
+    ]
+    encoding = max(encodings, key=accept_encodings.quality)
+    return encoding if accept_encodings.quality(encoding) > 0 else None
+
+
+def get_etag_variants(etag):
+    """
+    Return the ETags of the representations the current request can decode.
+
+    These are the plain ETag and the one of the encoding negotiated for the
+    request, an ETag of another encoding must not get a 304.
+
+    :param etag:
+    :return:
+    """
+    encoding = get_encoding()
+    return [etag] + ([f'{etag}-{encoding}'] if encoding else [])
+
+
+def compress(data, encoding):
+    """
+    Return data compressed with given encoding.
+
+    :param data: bytes.
+    :param encoding: ``br`` or ``gzip``.
+    :return:
+    """
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+
+    compressor = zlib.compressobj(
+        COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+    )
+    return compressor.compress(data) + compressor.flush()
+
+
+def iter_compressed(chunks, encoding):
+    """
+    Compress a streamed body chunk by chunk.
+
+    :param chunks: iterable of bytes or str.
+    :param encoding: ``br`` or ``gzip``.
+    :return:
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=COMPRESS_BROTLI_QUALITY)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(
+            COMPRESS_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS
+        )
+        process, finish = compressor.compress, compressor.flush
+
+    try:
+        for chunk in chunks:
+            data = process(chunk.encode() if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def compress_response(response):
+    """
+    Compress the body of response with the encoding the client prefers.
+
+    Bodies smaller than ``COMPRESS_MIN_SIZE`` bytes are sent as they are,
+    streamed bodies are compressed on the fly. Responses with an ETag are
+    compressed once and served from ``compressed_cache`` afterwards, their
+    ETag gets the encoding as suffix.
+
+    :param response:
+    :return:
+    """
+    not_modified = \
+        response.status_code == StatusCode.HTTP_304_NOT_MODIFIED.value
+    if response.mimetype not in COMPRESS_MIMETYPES and not not_modified:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = get_encoding()
+    if (
+        encoding is None
+        or response.status_code != StatusCode.HTTP_200_OK.value
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+    ):
+        return response
+
+    if response.is_streamed:
+        response.response = iter_compressed(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_data(compressed_cache.get_or_set(
+                (etag, encoding), lambda: compress(data, encoding)
+            ))
+            response.set_etag(f'{etag}-{encoding}', weak)
+        else:
+            response.set_data(compress(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,247 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from constants import StatusCode
+from .metrics import record_rejection
+
+# Every route gets its own limits. Every setting can be given per route,
+# e.g. ``LIMIT_ROUTE_PLAY_QUIZ_RATE`` for the ``play_quiz`` view, else per
+# permission, e.g. ``LIMIT_PLAY_QUIZ_RATE`` for ``play:quiz``, else for all
+# of them with ``LIMIT_DEFAULT_<SETTING>``. Limits are enforced per worker
+# process, 0 disables a limit.
+LIMIT_DEFAULTS = {
+    'CONCURRENCY': 0,
+    'RATE': 0,
+    'BURST': 0,
+    'ADDRESS_RATE': 0,
+    'ADDRESS_BURST': 0,
+    'QUEUE_TIMEOUT': 0,
+}
+LIMIT_RETRY_AFTER = int(os.environ.get('LIMIT_RETRY_AFTER', 1))
+LIMIT_MAX_CLIENTS = int(os.environ.get('LIMIT_MAX_CLIENTS', 10000))
+
+
+class LimitExceeded(Exception):
+    """Raised when a request is shed instead of being served."""
+
+    def __init__(self, status_code, retry_after):
+        """
+        Constructor for LimitExceeded
+
+        :param status_code: 429 for rate limits, 503 for concurrency limits.
+        :param retry_after: seconds after which the client may retry.
+        """
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class RateLimiter:
+    """
+    Token buckets per client refilled with ``rate`` tokens per second.
+
+    A client can send ``burst`` requests at once, the buckets of the least
+    recently seen clients are dropped beyond ``max_clients``.
+    """
+
+    def __init__(self, rate, burst=0, max_clients=LIMIT_MAX_CLIENTS):
+        """
+        Constructor for RateLimiter
+
+        :param rate: requests per second.
+        :param burst: bucket size, defaults to one second of requests.
+        :param max_clients:
+        """
+        self.rate = rate
+        self.burst = max(burst or rate, 1)
+        self.max_clients = max_clients
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """
+        Take a token from the bucket of given client.
+
+        :param key: client key.
+        :return: 0 when allowed, else seconds until a token is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+
+            retry_after = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / self.rate
+
+            # Re-inserted last so the dict stays ordered by last use.
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                del self._buckets[next(iter(self._buckets))]
+            return retry_after
+
+
+class ConcurrencyLimiter:
+    """Bound of the requests served at the same time."""
+
+    def __init__(self, limit, queue_timeout=0):
+        """
+        Constructor for ConcurrencyLimiter
+
+        :param limit: maximum number of requests served at once.
+        :param queue_timeout: seconds a request waits for a free slot.
+        """
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self._semaphore = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        """
+        Take a slot, waiting up to ``queue_timeout`` seconds.
+
+        :return: whether a slot was taken.
+        """
+        if self.queue_timeout:
+            return self._semaphore.acquire(timeout=self.queue_timeout)
+        return self._semaphore.acquire(blocking=False)
+
+    def release(self):
+        self._semaphore.release()
+
+
+class Admission:
+    """
+    Rate and concurrency limits of the routes requiring a permission.
+
+    Requests are admitted in two steps. Before the token is verified they
+    must pass the rate limit of their address and find a free slot, so
+    forged tokens cannot dodge the limits nor pile up requests. Once the
+    token is verified its subject must pass the rate limit of the client.
+    """
+
+    def __init__(self, permission, rate_limiter=None,
+                 concurrency_limiter=None, address_rate_limiter=None):
+        """
+        Constructor for Admission
+
+        :param permission:
+        :param rate_limiter: RateLimiter per verified client or None for no
+            rate limit.
+        :param concurrency_limiter: ConcurrencyLimiter or None for no limit.
+        :param address_rate_limiter: RateLimiter per address or None for no
+            rate limit.
+        """
+        self.permission = permission
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.address_rate_limiter = address_rate_limiter
+
+    def check_rate(self, rate_limiter, key):
+        """
+        Raise LimitExceeded if given rate limiter rejects the key.
+
+        :param rate_limiter: RateLimiter or None for no rate limit.
+        :param key:
+        """
+        retry_after = rate_limiter.acquire(key) if rate_limiter else 0
+        if retry_after:
+            record_rejection(self.permission, 'rate')
+            raise LimitExceeded(
+                StatusCode.HTTP_429_TOO_MANY_REQUESTS.value,
+                math.ceil(retry_after)
+            )
+
+    @contextmanager
+    def admit(self, address):
+        """
+        Serve the block if the limits allow it, else raise LimitExceeded.
+
+        :param address: address of the client, its token is not verified
+            yet.
+        """
+        self.check_rate(self.address_rate_limiter, address)
+
+        if not self.concurrency_limiter:
+            yield
+            return
+
+        if not self.concurrency_limiter.acquire():
+            record_rejection(self.permission, 'concurrency')
+            raise LimitExceeded(
+                StatusCode.HTTP_503_SERVICE_UNAVAILABLE.value,
+                LIMIT_RETRY_AFTER
+            )
+        try:
+            yield
+        finally:
+            self.concurrency_limiter.release()
+
+    def admit_client(self, client_key):
+        """
+        Raise LimitExceeded if the verified client is rate limited.
+
+        :param client_key: subject of the verified token.
+        """
+        self.check_rate(self.rate_limiter, client_key)
+
+
+def get_limit_setting(endpoint, permission, name):
+    """
+    Return a limit setting of given route from env.
+
+    :param endpoint: e.g. ``api.play_quiz``.
+    :param permission: e.g. ``play:quiz``.
+    :param name: e.g. ``RATE``.
+    :return:
+    """
+    route = endpoint.rsplit('.', 1)[-1].upper()
+    key = permission.upper().replace(':', '_') or 'PUBLIC'
+    return float(os.environ.get(
+        f'LIMIT_ROUTE_{route}_{name}',
+        os.environ.get(
+            f'LIMIT_{key}_{name}',
+            os.environ.get(f'LIMIT_DEFAULT_{name}', LIMIT_DEFAULTS[name])
+        )
+    ))
+
+
+_admissions = {}
+_admissions_lock = threading.Lock()
+
+
+def get_admission(endpoint, permission):
+    """
+    Return the admission of given route.
+
+    Every route has its own limits, so e.g. bulk imports cannot take the
+    slots of single inserts requiring the same permission.
+
+    :param endpoint: endpoint of the route, e.g. ``api.play_quiz``.
+    :param permission: permission required by the route.
+    :return:
+    """
+    with _admissions_lock:
+        if endpoint not in _admissions:
+            def setting(name):
+                return get_limit_setting(endpoint, permission, name)
+
+            rate = setting('RATE')
+            address_rate = setting('ADDRESS_RATE')
+            concurrency = int(setting('CONCURRENCY'))
+            _admissions[endpoint] = Admission(
+                permission,
+                rate_limiter=RateLimiter(
+                    rate, setting('BURST')
+                ) if rate else None,
+                concurrency_limiter=ConcurrencyLimiter(
+                    concurrency, setting('QUEUE_TIMEOUT')
+                ) if concurrency else None,
+                address_rate_limiter=RateLimiter(
+                    address_rate, setting('ADDRESS_BURST')
+                ) if address_rate else None
+            )
+        return _admissions[endpoint]
@@ -0,0 +1,167 @@
+import os
+import time
+
+from flask import g, has_request_context, request
+from prometheus_client import (
+    CollectorRegistry, CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram,
+    generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Set for gunicorn so every worker writes its samples to this directory and
+# /metrics aggregates those of all workers, see gunicorn.conf.py.
+MULTIPROC_DIR = os.environ.get('prometheus_multiproc_dir')
+
+REQUEST_DURATION = Histogram(
+    'trivia_request_duration_seconds',
+    'Time spent handling a request until its response is returned.',
+    ['method', 'route', 'status']
+)
+REQUEST_SQL_STATEMENTS = Histogram(
+    'trivia_request_sql_statements',
+    'Number of SQL statements executed by a request.',
+    ['method', 'route'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, float('inf'))
+)
+REQUEST_SQL_DURATION = Histogram(
+    'trivia_request_sql_duration_seconds',
+    'Time a request spent executing SQL statements.',
+    ['method', 'route']
+)
+SQL_STATEMENT_DURATION = Histogram(
+    'trivia_sql_statement_duration_seconds',
+    'Time spent executing a single SQL statement.',
+    ['operation']
+)
+JWT_VERIFY_DURATION = Histogram(
+    'trivia_jwt_verify_seconds',
+    'Time spent getting the payload of a bearer token.',
+    ['result'],
+    buckets=(
+        .0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25,
+        .5, 1, 2.5, float('inf')
+    )
+)
+REQUESTS_REJECTED = Counter(
+    'trivia_requests_rejected_total',
+    'Requests shed by the admission control by permission and limit.',
+    ['permission', 'limit']
+)
+CACHE_REQUESTS = Counter(
+    'trivia_cache_requests_total',
+    'Lookups of the in process caches by result.',
+    ['cache', 'result']
+)
+
+
+def get_registry():
+    """
+    Return the registry holding the samples of all workers.
+
+    :return:
+    """
+    if not MULTIPROC_DIR:
+        return REGISTRY
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def generate_metrics():
+    """
+    Return the metrics in the Prometheus text format and their content type.
+
+    :return:
+    """
+    return generate_latest(get_registry()), CONTENT_TYPE_LATEST
+
+
+def get_route():
+    """
+    Return the url rule of the current request, so paths with ids share a
+    label.
+
+    :return:
+    """
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def start_request():
+    """
+    Start timing the current request and its SQL statements.
+    """
+    g.metrics_started_at = time.perf_counter()
+    g.sql_statements = 0
+    g.sql_seconds = 0.0
+
+
+def record_request(response):
+    """
+    Record the duration and SQL usage of the current request.
+
+    :param response:
+    """
+    started_at = g.get('metrics_started_at')
+    if started_at is None:
+        return
+
+    method, route = request.method, get_route()
+    REQUEST_DURATION.labels(method, route, response.status_code).observe(
+        time.perf_counter() - started_at
+    )
+    REQUEST_SQL_STATEMENTS.labels(method, route).observe(g.sql_statements)
+    REQUEST_SQL_DURATION.labels(method, route).observe(g.sql_seconds)
+
+
+def record_cache_lookup(cache, hit):
+    """
+    Count a lookup of given cache.
+
+    :param cache: name of the cache.
+    :param hit: whether the entry was found.
+    """
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_rejection(permission, limit):
+    """
+    Count a request shed by the admission control.
+
+    :param permission:
+    :param limit: ``rate`` or ``concurrency``.
+    """
+    REQUESTS_REJECTED.labels(permission, limit).inc()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def before_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    conn.info.setdefault('metrics_started_at', []).append(
+        time.perf_counter()
+    )
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def after_cursor_execute(
+    conn, cursor, statement, parameters, context, executemany
+):
+    duration = time.perf_counter() - conn.info['metrics_started_at'].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper() \
+        if statement.strip() else 'UNKNOWN'
+    SQL_STATEMENT_DURATION.labels(operation).observe(duration)
+
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_statements += 1
+        g.sql_seconds += duration
+
+
+@event.listens_for(Engine, 'handle_error')
+def handle_error(context):
+    # after_cursor_execute is not called for failed statements.
+    if context.connection is not None:
+        started_at = context.connection.info.get('metrics_started_at')
+        if started_at:
+            started_at.pop()
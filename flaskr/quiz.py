@@ -0,0 +1,129 @@
+import os
+import random
+import threading
+from array import array
+from collections import OrderedDict
+
+from models import db, Question
+
+
+MAX_DRAW_ATTEMPTS = 8
+# Most questions a single /quizzes call can draw.
+QUIZ_MAX_COUNT = int(os.environ.get('QUIZ_MAX_COUNT', 50))
+# Most category pools kept, the least recently used ones are dropped beyond.
+QUIZ_POOL_SIZE = int(os.environ.get('QUIZ_POOL_SIZE', 64))
+
+
+class QuestionPool:
+    """
+    Compact per-category pools of question ids to draw quiz questions from.
+
+    Every pool is an array of ids tagged with the data version it was loaded
+    at and is reloaded on first use after a write. Drawing picks random slots
+    until enough are not in the excluded ids, which takes O(1) expected time
+    per question as long as the excluded ids are a small part of the pool.
+    At most ``maxsize`` pools are kept, least recently used ones first out.
+    """
+
+    def __init__(self, maxsize=QUIZ_POOL_SIZE):
+        """
+        Constructor for QuestionPool
+
+        :param maxsize: maximum number of category pools.
+        """
+        self.maxsize = maxsize
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_ids(self, category_id, version):
+        """
+        Return the array of question ids of given category.
+
+        :param category_id: category id or None for all the questions.
+        :param version: current data version.
+        :return:
+        """
+        with self._lock:
+            pool = self._pools.get(category_id)
+            if pool is not None:
+                self._pools.move_to_end(category_id)
+
+        if pool is None or pool[0] != version:
+            pool = version, self._load_ids(category_id)
+            with self._lock:
+                self._pools[category_id] = pool
+                self._pools.move_to_end(category_id)
+                while len(self._pools) > self.maxsize:
+                    self._pools.popitem(last=False)
+
+        return pool[1]
+
+    def draw(self, category_id, version, excluded=()):
+        """
+        Return a random question id of given category not in excluded.
+
+        :param category_id: category id or None for all the questions.
+        :param version: current data version.
+        :param excluded: ids of the questions already asked.
+        :return: question id or None if every question has been asked.
+        """
+        question_ids = self.sample(category_id, version, 1, excluded)
+        return question_ids[0] if question_ids else None
+
+    def sample(self, category_id, version, count, excluded=()):
+        """
+        Return up to count distinct random question ids not in excluded.
+
+        :param category_id: category id or None for all the questions.
+        :param version: current data version.
+        :param count: number of questions to draw.
+        :param excluded: ids of the questions already asked.
+        :return: list of question ids, shorter than count if the questions
+            run out.
+        """
+        ids = self.get_ids(category_id, version)
+        if not ids:
+            return []
+
+        excluded = set(excluded)
+        sampled = []
+        for _ in range(MAX_DRAW_ATTEMPTS * count):
+            question_id = ids[random.randrange(len(ids))]
+            if question_id not in excluded:
+                sampled.append(question_id)
+                excluded.add(question_id)
+                if len(sampled) == count:
+                    return sampled
+
+        eligible = [
+            question_id for question_id in ids if question_id not in excluded
+        ]
+        return sampled + random.sample(
+            eligible, min(count - len(sampled), len(eligible))
+        )
+
+    def clear(self):
+        """
+        Drop all the pools.
+        """
+        with self._lock:
+            self._pools = OrderedDict()
+
+    @staticmethod
+    def _load_ids(category_id):
+        """
+        Load the ids of the questions of given category.
+
+        :param category_id: category id or None for all the questions.
+        :return:
+        """
+        query = db.session.query(Question.id)
+        if category_id:
+            query = query.filter(Question.category == category_id)
+
+        return array('l', (
+            question_id for question_id, in query.order_by(Question.id)
+        ))
+
+
+question_pool = QuestionPool()
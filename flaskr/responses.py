@@ -0,0 +1,39 @@
+import json
+
+from flask import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data):
+    """
+    Serialize data to JSON bytes, with orjson when it is installed.
+
+    Non string keys such as the category ids are turned into strings like
+    the stdlib encoder does.
+
+    :param data:
+    :return:
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+class JSONResponse(Response):
+    """Response serializing its data with the fast JSON encoder."""
+
+    default_mimetype = 'application/json'
+
+    def __init__(self, data, status=None, headers=None):
+        """
+        Constructor for JSONResponse
+
+        :param data: JSON serializable data.
+        :param status:
+        :param headers:
+        """
+        super().__init__(dumps(data), status=status, headers=headers)
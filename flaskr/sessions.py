@@ -0,0 +1,254 @@
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+QUIZ_SESSION_STORE = os.environ.get('QUIZ_SESSION_STORE', 'memory')
+QUIZ_SESSION_TTL = int(os.environ.get('QUIZ_SESSION_TTL', 3600))
+QUIZ_SESSION_MAX = int(os.environ.get('QUIZ_SESSION_MAX', 10000))
+QUIZ_SESSION_MAX_QUESTION_IDS = int(
+    os.environ.get('QUIZ_SESSION_MAX_QUESTION_IDS', 5000000)
+)
+
+
+class SessionNotFound(Exception):
+    """Raised when a quiz session does not exist or has expired."""
+
+
+class QuizSessionStore:
+    """
+    Base class of the stores holding quiz sessions.
+
+    A session is a pre-shuffled permutation of question ids and a cursor
+    pointing to the next question to ask.
+    """
+
+    def __init__(self, ttl=QUIZ_SESSION_TTL, max_sessions=QUIZ_SESSION_MAX):
+        """
+        Constructor for QuizSessionStore
+
+        :param ttl: seconds a session lives after its last use.
+        :param max_sessions: maximum number of sessions kept, the oldest
+            ones are dropped first.
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+
+    def create(self, question_ids):
+        """
+        Create a session asking given question ids in order.
+
+        :param question_ids: array of question ids.
+        :return: session id.
+        """
+        raise NotImplementedError
+
+    def advance(self, session_id):
+        """
+        Return the next question id of the session and move its cursor.
+
+        :param session_id:
+        :return: question id or None once every question has been asked.
+        :raises SessionNotFound: if the session does not exist or expired.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def new_session_id():
+        return secrets.token_urlsafe(16)
+
+
+class MemoryQuizSessionStore(QuizSessionStore):
+    """Quiz sessions kept in the memory of the current process."""
+
+    def __init__(
+        self, ttl=QUIZ_SESSION_TTL, max_sessions=QUIZ_SESSION_MAX,
+        max_question_ids=QUIZ_SESSION_MAX_QUESTION_IDS
+    ):
+        """
+        Constructor for MemoryQuizSessionStore
+
+        :param ttl: seconds a session lives after its last use.
+        :param max_sessions: maximum number of sessions kept.
+        :param max_question_ids: maximum number of question ids kept over
+            all the sessions.
+        """
+        super().__init__(ttl, max_sessions)
+        self.max_question_ids = max_question_ids
+        self._sessions = OrderedDict()
+        self._question_ids_count = 0
+        self._lock = threading.Lock()
+
+    def create(self, question_ids):
+        session_id = self.new_session_id()
+        question_ids = array('l', question_ids)
+
+        with self._lock:
+            self._drop_expired()
+            self._sessions[session_id] = [
+                time.time() + self.ttl, 0, question_ids
+            ]
+            self._question_ids_count += len(question_ids)
+            while self._sessions and (
+                len(self._sessions) > self.max_sessions
+                or self._question_ids_count > self.max_question_ids
+            ):
+                self._drop(next(iter(self._sessions)))
+
+        return session_id
+
+    def advance(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session[0] <= time.time():
+                raise SessionNotFound(session_id)
+
+            _, cursor, question_ids = session
+            session[0] = time.time() + self.ttl
+            self._sessions.move_to_end(session_id)
+            if cursor >= len(question_ids):
+                return None
+
+            session[1] = cursor + 1
+            return question_ids[cursor]
+
+    def _drop_expired(self):
+        now = time.time()
+        expired = [
+            session_id for session_id, session in self._sessions.items()
+            if session[0] <= now
+        ]
+        for session_id in expired:
+            self._drop(session_id)
+
+    def _drop(self, session_id):
+        session = self._sessions.pop(session_id)
+        self._question_ids_count -= len(session[2])
+
+
+class SQLiteQuizSessionStore(QuizSessionStore):
+    """
+    Quiz sessions kept in a local SQLite file.
+
+    The file can be shared by all the gunicorn workers of a host, so a
+    session created by one worker can be played through any other.
+    """
+
+    def __init__(
+        self, path, ttl=QUIZ_SESSION_TTL, max_sessions=QUIZ_SESSION_MAX
+    ):
+        """
+        Constructor for SQLiteQuizSessionStore
+
+        :param path: path of the SQLite file.
+        :param ttl: seconds a session lives after its last use.
+        :param max_sessions: maximum number of sessions kept.
+        """
+        super().__init__(ttl, max_sessions)
+        self.path = path
+        self._local = threading.local()
+        with self._transaction() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS quiz_sessions ('
+                'id TEXT PRIMARY KEY, expires_at REAL NOT NULL, '
+                'cursor INTEGER NOT NULL, question_ids BLOB NOT NULL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS ix_quiz_sessions_expires_at '
+                'ON quiz_sessions (expires_at)'
+            )
+
+    def create(self, question_ids):
+        session_id = self.new_session_id()
+        question_ids = array('l', question_ids)
+        now = time.time()
+
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM quiz_sessions WHERE expires_at <= ?', (now,)
+            )
+            connection.execute(
+                'INSERT INTO quiz_sessions VALUES (?, ?, 0, ?)',
+                (session_id, now + self.ttl, question_ids.tobytes())
+            )
+            connection.execute(
+                'DELETE FROM quiz_sessions WHERE id IN ('
+                'SELECT id FROM quiz_sessions ORDER BY expires_at DESC '
+                'LIMIT -1 OFFSET ?)', (self.max_sessions,)
+            )
+
+        return session_id
+
+    def advance(self, session_id):
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT cursor, question_ids FROM quiz_sessions '
+                'WHERE id = ? AND expires_at > ?', (session_id, now)
+            ).fetchone()
+            if row is None:
+                raise SessionNotFound(session_id)
+
+            cursor, data = row
+            question_ids = array('l')
+            question_ids.frombytes(data)
+            question_id = question_ids[cursor] \
+                if cursor < len(question_ids) else None
+            connection.execute(
+                'UPDATE quiz_sessions SET cursor = ?, expires_at = ? '
+                'WHERE id = ?',
+                (
+                    cursor + 1 if question_id is not None else cursor,
+                    now + self.ttl, session_id
+                )
+            )
+
+        return question_id
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Run a write transaction on the connection of the current thread.
+
+        Transactions start with BEGIN IMMEDIATE so concurrent workers
+        advancing the same session never hand out the same question.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            # Connections are never shared with forked workers.
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+
+def get_session_store(url=QUIZ_SESSION_STORE):
+    """
+    Return the quiz session store for given url.
+
+    :param url: ``memory`` or ``sqlite:///<path>``.
+    :return:
+    """
+    if url == 'memory':
+        return MemoryQuizSessionStore()
+    if url.startswith('sqlite:///'):
+        return SQLiteQuizSessionStore(url[len('sqlite:///'):])
+
+    raise ValueError(f'Unsupported quiz session store: {url}')
+
+
+session_store = get_session_store()
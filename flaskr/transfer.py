@@ -0,0 +1,239 @@
+import csv
+import io
+import os
+import sys
+import time
+
+from models import db, Question, bump_data_version
+from .bulk import (
+    EXPORT_FIELDS, QUESTION_FIELDS, iter_csv_export, iter_ndjson,
+    iter_ndjson_export, iter_question_rows, validate_question
+)
+
+
+FILE_FORMATS = ('csv', 'ndjson')
+IMPORT_BATCH_SIZE = 10000
+
+
+def guess_format(path):
+    """
+    Return the file format from the extension of path.
+
+    :param path:
+    :return:
+    """
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension in ('jsonl', 'json'):
+        return 'ndjson'
+    return extension if extension in FILE_FORMATS else 'csv'
+
+
+def iter_file_rows(file, file_format):
+    """
+    Yield the records of a CSV or NDJSON file.
+
+    :param file: text file.
+    :param file_format: ``csv`` or ``ndjson``.
+    """
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+    else:
+        yield from iter_ndjson(file)
+
+
+def import_questions(
+    path, file_format=None, batch_size=IMPORT_BATCH_SIZE, resume=False,
+    checkpoint_path=None, log=sys.stderr
+):
+    """
+    Import the questions of a CSV or NDJSON file in batches.
+
+    On Postgres every batch is loaded with ``COPY FROM STDIN``, elsewhere
+    with an executemany insert. Each batch is committed on its own and the
+    number of records done is written to a checkpoint file, so a failed
+    import can be resumed after the last committed batch. Ids of the file
+    are ignored, questions get new ids.
+
+    :param path: path of the file to import.
+    :param file_format: ``csv`` or ``ndjson``, guessed from the extension
+        if not given.
+    :param batch_size: number of records committed together.
+    :param resume: skip the records done by a previous run.
+    :param checkpoint_path: defaults to the path of the file with a
+        ``.checkpoint`` suffix.
+    :param log: file progress is reported to.
+    :return: number of imported and skipped invalid records.
+    """
+    file_format = file_format or guess_format(path)
+    checkpoint_path = checkpoint_path or f'{path}.checkpoint'
+    done = read_checkpoint(checkpoint_path) if resume else 0
+    imported = skipped = 0
+    started_at = time.monotonic()
+
+    with open(path, newline='') as file:
+        batch = []
+        for index, record in enumerate(iter_file_rows(file, file_format)):
+            if index < done:
+                continue
+
+            try:
+                if isinstance(record, Exception):
+                    raise ValueError(f'invalid JSON: {record}')
+                record = {
+                    field: record.get(field) for field in QUESTION_FIELDS
+                } if isinstance(record, dict) else record
+                batch.append(validate_question(record))
+            except ValueError as error:
+                skipped += 1
+                print(f'record {index + 1} skipped: {error}', file=log)
+
+            if len(batch) >= batch_size:
+                imported += copy_batch(batch)
+                batch = []
+                write_checkpoint(checkpoint_path, index + 1)
+                report_progress(imported, started_at, log)
+
+        if batch:
+            imported += copy_batch(batch)
+            report_progress(imported, started_at, log)
+
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    return imported, skipped
+
+
+def copy_batch(rows):
+    """
+    Insert a batch of validated rows and commit it.
+
+    :param rows: list of question dicts.
+    :return: number of inserted rows.
+    """
+    connection = db.session.connection()
+    try:
+        if connection.dialect.name == 'postgresql':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow([row[field] for field in QUESTION_FIELDS])
+            buffer.seek(0)
+
+            cursor = connection.connection.cursor()
+            cursor.copy_expert(
+                f'COPY {Question.__tablename__} '
+                f'({", ".join(QUESTION_FIELDS)}) FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+        else:
+            db.session.execute(Question.__table__.insert(), rows)
+
+        bump_data_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(rows)
+
+
+def export_questions(
+    path, file_format=None, category_id=None, difficulty=None, after=None,
+    log=sys.stderr
+):
+    """
+    Export the questions to a CSV or NDJSON file.
+
+    CSV exports from Postgres use ``COPY TO STDOUT``, other exports stream
+    rows from a server side cursor.
+
+    :param path: path of the file to write.
+    :param file_format: ``csv`` or ``ndjson``, guessed from the extension
+        if not given.
+    :param category_id:
+    :param difficulty:
+    :param after: only export questions with a greater id.
+    :param log: file progress is reported to.
+    """
+    file_format = file_format or guess_format(path)
+    started_at = time.monotonic()
+    connection = db.session.connection()
+
+    with open(path, 'w', newline='') as file:
+        if file_format == 'csv' and connection.dialect.name == 'postgresql':
+            query = db.session.query(
+                *[getattr(Question, field) for field in EXPORT_FIELDS]
+            ).order_by(Question.id)
+            if category_id is not None:
+                query = query.filter(Question.category == category_id)
+            if difficulty is not None:
+                query = query.filter(Question.difficulty == difficulty)
+            if after is not None:
+                query = query.filter(Question.id > after)
+
+            sql = query.statement.compile(
+                dialect=connection.dialect,
+                compile_kwargs={'literal_binds': True}
+            )
+            cursor = connection.connection.cursor()
+            cursor.copy_expert(
+                f'COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)', file
+            )
+            exported = max(cursor.rowcount, 0)
+        else:
+            exported = 0
+
+            def count_rows(rows):
+                nonlocal exported
+                for row in rows:
+                    yield row
+                    exported += 1
+                    if exported % IMPORT_BATCH_SIZE == 0:
+                        report_progress(exported, started_at, log, 'exported')
+
+            rows = count_rows(iter_question_rows(
+                category_id=category_id, difficulty=difficulty, after=after
+            ))
+            lines = iter_csv_export(rows) if file_format == 'csv' \
+                else iter_ndjson_export(rows)
+            file.writelines(lines)
+
+    report_progress(exported, started_at, log, 'exported')
+    return exported
+
+
+def read_checkpoint(checkpoint_path):
+    """
+    Return the number of records done by a previous import.
+
+    :param checkpoint_path:
+    :return:
+    """
+    if not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path) as file:
+        return int(file.read().strip() or 0)
+
+
+def write_checkpoint(checkpoint_path, done):
+    """
+    Record the number of records done after a committed batch.
+
+    :param checkpoint_path:
+    :param done:
+    """
+    with open(checkpoint_path, 'w') as file:
+        file.write(str(done))
+
+
+def report_progress(count, started_at, log, action='imported'):
+    """
+    Print the number of rows handled so far and the rate.
+
+    :param count:
+    :param started_at: monotonic time the transfer started at.
+    :param log:
+    :param action:
+    """
+    elapsed = max(time.monotonic() - started_at, 1e-9)
+    print(f'{count} rows {action} ({count / elapsed:.0f} rows/s)', file=log)
@@ -1,7 +1,28 @@
-from models import Category, Question
+import hashlib
+import os
+from functools import wraps
+
+from flask import current_app, g, make_response, request
+from sqlalchemy import func
+
+from constants import StatusCode
+
+from models import (
+    db, Category, Question, QUESTION_SEARCH_CONFIG, get_data_version,
+    question_search_vector
+)
+from .cache import response_cache
+from .compression import get_etag_variants
 
 
 PAGE_LIMIT = 10
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 5))
+DATA_VERSION_HEADER = 'X-Data-Version'
+DATA_VERSION_COOKIE = 'data_version'
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+QUESTION_COLUMNS = ('id', 'question', 'answer', 'category', 'difficulty')
+QUESTION_INCLUDES = ('categories',)
+CACHE_MAX_AGE = int(os.environ.get('CACHE_MAX_AGE', 0))
 
 
 def get_range(page):
@@ -17,26 +38,387 @@ def get_range(page):
     return start, end
 
 
-def get_questions_list(page=None, query=None, category_id=None):
+def get_questions_list(
+    page=None, query=None, category_id=None, after=None,
+    columns=QUESTION_COLUMNS
+):
     """
     Return list of questions.
 
-    :param query:
+    Pagination is done in SQL so only the requested page is loaded. Totals
+    of searches are counted in SQL, the others come from the cached category
+    counts. When ``after`` is given the page is fetched with a keyset cursor
+    on ``Question.id`` instead of an offset, so deep pages cost the same as
+    the first one. Questions matching ``query`` are ranked by relevance
+    unless paged with ``after``.
+
+    :param page: page number from 1, None for all the questions.
+    :param query: search term.
     :param category_id:
-    :return:
+    :param after: id of the last question of the previous page.
+    :param columns: names of the question columns to select.
+    :return: questions, total_questions_count
     """
+    questions = select_questions(columns)
+    order_by = [Question.id]
+
+    if category_id:
+        questions = questions.filter(Question.category == category_id)
     if query:
-        questions = Question.query.filter(
-            Question.question.ilike(f'%{query}%')
-        ).all()
-    elif category_id:
-        questions = Question.query.order_by(Question.id).filter_by(category=category_id).all()
+        questions, rank = search_questions(questions, query)
+        if rank is not None and after is None:
+            order_by = [rank.desc(), Question.id]
+        total_questions_count = questions.count()
     else:
-        questions = Question.query.order_by(Question.id).all()
+        total_questions_count = get_questions_count(category_id)
+    questions = questions.order_by(*order_by)
+
+    if after is not None:
+        questions = questions.filter(Question.id > after).limit(PAGE_LIMIT)
+    elif page is not None:
+        if page < 1:
+            return [], total_questions_count
+        start, _ = get_range(page)
+        questions = questions.offset(start).limit(PAGE_LIMIT)
+
+    return [format_question_row(row, columns) for row in questions], \
+        total_questions_count
+
+
+def get_question_columns():
+    """
+    Return the question columns requested with ``?fields=``.
+
+    The id is always selected, it identifies the questions and is the cursor
+    of the next page.
+
+    :return: names of the columns in table order, all of them by default.
+    :raises ValueError: if an unknown field is requested.
+    """
+    fields = request.args.get('fields')
+    if fields is None:
+        return QUESTION_COLUMNS
+
+    fields = {field.strip() for field in fields.split(',') if field.strip()}
+    if not fields.issubset(QUESTION_COLUMNS):
+        raise ValueError(f'Unknown fields: {fields - set(QUESTION_COLUMNS)}')
+    return tuple(
+        column for column in QUESTION_COLUMNS
+        if column == 'id' or column in fields
+    )
+
+
+def get_includes(default=()):
+    """
+    Return the related data requested with ``?include=``.
+
+    :param default: related data embedded when the parameter is missing.
+    :return: set of names.
+    :raises ValueError: if unknown related data is requested.
+    """
+    include = request.args.get('include')
+    if include is None:
+        return set(default)
+
+    includes = {name.strip() for name in include.split(',') if name.strip()}
+    if not includes.issubset(QUESTION_INCLUDES):
+        raise ValueError(f'Unknown includes: {includes}')
+    return includes
+
+
+def select_questions(columns=QUESTION_COLUMNS):
+    """
+    Return a query selecting plain column tuples of questions.
+
+    Rows skip ORM entity construction and the identity map, which dominate
+    the cost of large reads.
+
+    :param columns: names of the question columns to select.
+    :return:
+    """
+    return db.session.query(
+        *[getattr(Question, column) for column in columns]
+    )
+
+
+def format_question_row(row, columns=QUESTION_COLUMNS):
+    """
+    Format a row selected by select_questions like Question.format.
+
+    :param row:
+    :param columns: names of the selected columns.
+    :return:
+    """
+    return dict(zip(columns, row))
+
+
+def get_question(question_id):
+    """
+    Return the formatted question with given id or None if missing.
+
+    :param question_id:
+    :return:
+    """
+    row = select_questions().filter(Question.id == question_id).first()
+    return format_question_row(row) if row else None
+
+
+def get_questions_by_ids(question_ids, columns=QUESTION_COLUMNS):
+    """
+    Return the formatted questions with given ids in a single query.
+
+    :param question_ids:
+    :param columns: names of the question columns to select.
+    :return: questions in the order of the ids, missing ones are skipped.
+    """
+    if not question_ids:
+        return []
+
+    rows = select_questions(columns).filter(Question.id.in_(question_ids))
+    questions = {
+        question['id']: question
+        for question in (format_question_row(row, columns) for row in rows)
+    }
+    return [
+        questions[question_id] for question_id in question_ids
+        if question_id in questions
+    ]
+
+
+def search_questions(questions, search_term):
+    """
+    Filter questions to the ones matching search term.
+
+    On Postgres the match uses the full-text index on the question text and
+    is ranked, elsewhere it falls back to a case insensitive substring match.
+
+    :param questions: query to filter.
+    :param search_term:
+    :return: filtered query, rank expression or None if not ranked.
+    """
+    if db.session.get_bind().dialect.name == 'postgresql':
+        ts_query = func.plainto_tsquery(QUESTION_SEARCH_CONFIG, search_term)
+        questions = questions.filter(
+            question_search_vector().op('@@')(ts_query)
+        )
+        return questions, func.ts_rank(question_search_vector(), ts_query)
+
+    search_term = search_term.replace('\\', '\\\\') \
+        .replace('%', '\\%').replace('_', '\\_')
+    questions = questions.filter(
+        Question.question.ilike(f'%{search_term}%', escape='\\')
+    )
+    return questions, None
+
+
+def get_next_cursor(questions):
+    """
+    Return the cursor for the page following the given one.
+
+    :param questions: formatted questions of the current page.
+    :return: id of the last question or None if this is the last page.
+    """
+    if len(questions) < PAGE_LIMIT:
+        return None
+    return questions[-1].get('id')
+
+
+def get_request_data_version():
+    """
+    Return the data version, read once per request.
+
+    :return:
+    """
+    if 'data_version' not in g:
+        g.data_version = get_data_version()
+    return g.data_version
+
+
+def get_cache_key(endpoint, page=None, category_id=None, columns=None):
+    """
+    Return the response cache key for given endpoint, page and category.
+
+    :param endpoint:
+    :param page:
+    :param category_id:
+    :param columns: names of the selected columns, if not all of them.
+    :return:
+    """
+    return endpoint, page, category_id, columns, get_request_data_version()
+
+
+def get_categories_map():
+    """
+    Return the cached map of category id to category type.
+
+    :return:
+    """
+    return response_cache.get_or_set(
+        get_cache_key('categories'),
+        lambda: {
+            category.id: category.type for category in Category.query.all()
+        }
+    )
+
+
+def get_quiz_category_id(quiz_category):
+    """
+    Return the id of the quiz category of a request as int.
+
+    An id of 0 or none selects all the questions and is returned as None.
+
+    :param quiz_category: ``quiz_category`` of the request body.
+    :return:
+    :raise ValueError: for malformed ids and ids of unknown categories.
+    """
+    if not isinstance(quiz_category, dict):
+        raise ValueError('quiz_category must be an object')
+
+    category_id = int(quiz_category.get('id') or 0)
+    if not category_id:
+        return None
+    if category_id not in get_categories_map():
+        raise ValueError(f'unknown category {category_id}')
+    return category_id
+
+
+def get_category_counts():
+    """
+    Return the cached number of questions per category id.
+
+    Counted with a single GROUP BY per data version, questions without a
+    category are counted under None.
+
+    :return:
+    """
+    return response_cache.get_or_set(
+        get_cache_key('category_counts'),
+        lambda: dict(
+            db.session.query(Question.category, func.count(Question.id))
+            .group_by(Question.category)
+        )
+    )
+
+
+def get_questions_count(category_id=None):
+    """
+    Return the number of questions of given category, or of all of them.
+
+    :param category_id:
+    :return:
+    """
+    counts = get_category_counts()
+    if category_id:
+        return counts.get(category_id, 0)
+    return sum(counts.values())
+
+
+def get_client_data_version():
+    """
+    Return the data version the client saw after its last write, or 0.
+
+    It is sent back in the ``X-Data-Version`` header or the cookie of the
+    same name set by ``record_write``.
+
+    :return:
+    """
+    version = request.headers.get(DATA_VERSION_HEADER) \
+        or request.cookies.get(DATA_VERSION_COOKIE)
+    try:
+        return int(version or 0)
+    except ValueError:
+        return 0
+
 
-    total_questions_count = len(questions)
-    if page:
-        start, end = get_range(page)
-        questions = questions[start:end]
+def read_only(f):
+    """
+    Mark a view as read-only so its queries may run on the read replica.
+
+    A client that wrote reads from the primary database until the data
+    version of the replica caught up with the one after its write, so it
+    sees its own writes whichever worker serves it.
+
+    :param f: view function.
+    :return:
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        g.use_replica = True
+        client_version = get_client_data_version()
+        if client_version and get_request_data_version() < client_version:
+            g.use_replica = False
+            # Read again from the primary database for the cache keys.
+            g.pop('data_version')
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def record_write(response):
+    """
+    Hand the data version after a successful write back to the client.
+
+    :param response:
+    """
+    if (
+        request.method in WRITE_METHODS
+        and not g.get('read_only')
+        and response.status_code < StatusCode.HTTP_400_BAD_REQUEST.value
+    ):
+        version = str(get_data_version())
+        response.headers[DATA_VERSION_HEADER] = version
+        response.set_cookie(
+            DATA_VERSION_COOKIE, version, max_age=READ_YOUR_WRITES_SECONDS,
+            httponly=True, samesite='Lax'
+        )
+
+
+def get_etag():
+    """
+    Return the strong ETag of the current GET request.
+
+    The representation of a read endpoint only depends on its url and the
+    data version, so the ETag is derived from both without loading data.
+
+    :return:
+    """
+    return hashlib.sha1(
+        f'{get_request_data_version()}:{request.full_path}'.encode()
+    ).hexdigest()
+
+
+def conditional(f):
+    """
+    Answer conditional GETs of a read endpoint from the data version.
+
+    Requests with a matching ``If-None-Match``, for the plain or the
+    negotiated encoding of the representation, get a 304 without running
+    the view. Successful
+    responses carry the ETag and a ``Cache-Control`` header letting shared
+    caches store them and revalidate after ``CACHE_MAX_AGE`` seconds.
+
+    :param f: view function.
+    :return:
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        etag = get_etag()
+        matched_etag = next((
+            variant for variant in get_etag_variants(etag)
+            if request.if_none_match.contains(variant)
+        ), None)
+        if matched_etag:
+            etag = matched_etag
+            response = current_app.response_class(
+                status=StatusCode.HTTP_304_NOT_MODIFIED.value
+            )
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != StatusCode.HTTP_200_OK.value:
+                return response
 
-    return [question.format() for question in questions], total_questions_count
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = \
+            f'public, max-age={CACHE_MAX_AGE}'
+        return response
+    return wrapper
@@ -0,0 +1,77 @@
+"""
+Gunicorn settings, loaded by ``gunicorn flaskr:app`` from the working
+directory.
+
+``GUNICORN_WORKER_CLASS=gevent`` switches to the async serving mode: every
+worker serves up to ``GUNICORN_WORKER_CONNECTIONS`` requests concurrently
+on greenlets, so a slow JWKS fetch or database call only blocks its own
+request. Sockets are patched before the app is imported and psycopg2 waits
+cooperatively on gevent, routes and error responses stay the same.
+
+Set ``prometheus_multiproc_dir`` to an empty directory so that /metrics
+aggregates the samples written there by every worker.
+
+``GUNICORN_PRELOAD=true`` imports the app once in the master process, so
+workers fork from a warmed parent instead of importing it one by one.
+"""
+import glob
+import os
+import sys
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+preload_app = os.environ.get(
+    'GUNICORN_PRELOAD', 'false'
+).lower() in ('1', 'true', 'yes')
+
+if worker_class == 'gevent':
+    # Patch as early as possible so module level locks and sockets created
+    # while importing the app are cooperative too.
+    from gevent import monkey
+    monkey.patch_all()
+
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        # psycopg2 is not installed, e.g. when running locally on SQLite.
+        pass
+    else:
+        patch_psycopg()
+
+
+def post_fork(server, worker):
+    """
+    Drop the database connections a preloaded app inherited from the master.
+
+    :param server:
+    :param worker:
+    """
+    flaskr = sys.modules.get('flaskr')
+    if flaskr is not None:
+        from models import dispose_engines
+        dispose_engines(flaskr.app)
+
+
+def on_starting(server):
+    """
+    Drop the metric samples left over by workers of a previous run.
+
+    :param server:
+    """
+    multiproc_dir = os.environ.get('prometheus_multiproc_dir')
+    if multiproc_dir:
+        for path in glob.glob(os.path.join(multiproc_dir, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    """
+    Stop reporting the live samples of an exited worker.
+
+    :param server:
+    :param worker:
+    """
+    if os.environ.get('prometheus_multiproc_dir'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
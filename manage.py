@@ -1,13 +1,67 @@
-from flask_script import Manager
+from flask_script import Command, Manager, Option
 from flask_migrate import Migrate, MigrateCommand
 
 from flaskr import app
+from flaskr.transfer import (
+    FILE_FORMATS, IMPORT_BATCH_SIZE, export_questions, import_questions
+)
 from models import db
 
 migrate = Migrate(app, db)
 manager = Manager(app)
 
+
+class ImportQuestions(Command):
+    """Import questions from a CSV or NDJSON file."""
+
+    option_list = (
+        Option('path', help='CSV or NDJSON file to import'),
+        Option('-f', '--format', dest='file_format', choices=FILE_FORMATS,
+               help='file format, guessed from the extension by default'),
+        Option('-b', '--batch-size', dest='batch_size', type=int,
+               default=IMPORT_BATCH_SIZE,
+               help='number of rows committed together'),
+        Option('--resume', action='store_true',
+               help='skip the rows imported before a failed batch'),
+        Option('--checkpoint', dest='checkpoint_path',
+               help='checkpoint file, defaults to <path>.checkpoint'),
+    )
+
+    def run(self, path, file_format, batch_size, resume, checkpoint_path):
+        imported, skipped = import_questions(
+            path, file_format=file_format, batch_size=batch_size,
+            resume=resume, checkpoint_path=checkpoint_path
+        )
+        print(f'{imported} questions imported, {skipped} skipped')
+
+
+class ExportQuestions(Command):
+    """Export questions to a CSV or NDJSON file."""
+
+    option_list = (
+        Option('path', help='CSV or NDJSON file to write'),
+        Option('-f', '--format', dest='file_format', choices=FILE_FORMATS,
+               help='file format, guessed from the extension by default'),
+        Option('--category', dest='category_id', type=int),
+        Option('--difficulty', type=int),
+        Option('--after', type=int,
+               help='only export questions with a greater id'),
+    )
+
+    def run(self, path, file_format, category_id, difficulty, after):
+        exported = export_questions(
+            path, file_format=file_format, category_id=category_id,
+            difficulty=difficulty, after=after
+        )
+        print(f'{exported} questions exported')
+
+
+questions_manager = Manager(usage='Import and export questions')
+questions_manager.add_command('import', ImportQuestions())
+questions_manager.add_command('export', ExportQuestions())
+
 manager.add_command('db', MigrateCommand)
+manager.add_command('questions', questions_manager)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,45 @@
+"""initial schema
+
+Revision ID: 3f1c2a9d8b01
+Revises:
+Create Date: 2026-10-16 10:12:41.103254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d8b01'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases restored from trivia.psql already have both tables.
+    tables = sa.inspect(op.get_bind()).get_table_names()
+
+    if 'categories' not in tables:
+        op.create_table(
+            'categories',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('type', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+    if 'questions' not in tables:
+        op.create_table(
+            'questions',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('question', sa.String(), nullable=True),
+            sa.Column('answer', sa.String(), nullable=True),
+            sa.Column('category', sa.String(), nullable=True),
+            sa.Column('difficulty', sa.Integer(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('questions')
+    op.drop_table('categories')
@@ -0,0 +1,112 @@
+"""question category foreign key and indexes
+
+Revision ID: 8e4b7c6d2a13
+Revises: 3f1c2a9d8b01
+Create Date: 2026-10-16 10:48:05.512870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4b7c6d2a13'
+down_revision = '3f1c2a9d8b01'
+branch_labels = None
+depends_on = None
+
+# Names unnamed foreign keys like the one of the model, so the foreign key
+# of a database created by db.create_all() can be dropped on SQLite too.
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s'}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {
+        column['name']: column for column in inspector.get_columns('questions')
+    }
+    has_foreign_key = any(
+        foreign_key['referred_table'] == 'categories'
+        for foreign_key in inspector.get_foreign_keys('questions')
+    )
+    indexes = {index['name'] for index in inspector.get_indexes('questions')}
+
+    if not has_foreign_key:
+        # Categories referenced by no row would fail the new constraint.
+        category_id = 'id' \
+            if isinstance(columns['category']['type'], sa.Integer) \
+            else 'CAST(id AS VARCHAR)'
+        op.execute(
+            'UPDATE questions SET category = NULL '
+            'WHERE category IS NOT NULL '
+            f'AND category NOT IN (SELECT {category_id} FROM categories)'
+        )
+
+    with op.batch_alter_table('questions') as batch_op:
+        if not isinstance(columns['category']['type'], sa.Integer):
+            batch_op.alter_column(
+                'category',
+                existing_type=columns['category']['type'],
+                type_=sa.Integer(),
+                postgresql_using='category::integer'
+            )
+        if not has_foreign_key:
+            batch_op.create_foreign_key(
+                'fk_questions_category', 'categories', ['category'], ['id'],
+                onupdate='CASCADE', ondelete='SET NULL'
+            )
+
+    if 'ix_questions_category_id' not in indexes:
+        op.create_index(
+            'ix_questions_category_id', 'questions', ['category', 'id']
+        )
+    if 'ix_questions_category_difficulty' not in indexes:
+        op.create_index(
+            'ix_questions_category_difficulty', 'questions',
+            ['category', 'difficulty']
+        )
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            'CREATE INDEX IF NOT EXISTS ix_questions_question_tsv '
+            "ON questions USING gin (to_tsvector('english', question))"
+        )
+
+    if 'data_version' not in inspector.get_table_names():
+        data_version = op.create_table(
+            'data_version',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        # The single row is only ever updated, so concurrent first writes
+        # cannot race to insert it.
+        op.bulk_insert(data_version, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    foreign_key_name = next((
+        foreign_key['name']
+        for foreign_key in sa.inspect(op.get_bind()).get_foreign_keys(
+            'questions'
+        )
+        if foreign_key['referred_table'] == 'categories'
+        and foreign_key['name']
+    ), 'fk_questions_category')
+
+    op.drop_table('data_version')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_questions_question_tsv')
+    op.drop_index('ix_questions_category_difficulty', 'questions')
+    op.drop_index('ix_questions_category_id', 'questions')
+
+    with op.batch_alter_table(
+        'questions', naming_convention=NAMING_CONVENTION
+    ) as batch_op:
+        batch_op.drop_constraint(foreign_key_name, type_='foreignkey')
+        batch_op.alter_column(
+            'category',
+            existing_type=sa.Integer(),
+            type_=sa.String(),
+            postgresql_using='category::varchar'
+        )
@@ -1,32 +1,180 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
-from flask_sqlalchemy import SQLAlchemy
+import time
+from sqlalchemy import (
+    Column, DDL, ForeignKey, Index, String, Integer, create_engine, event,
+    func
+)
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
 import json
 
-db = SQLAlchemy()
+REPLICA_BIND = 'replica'
 
 
-def setup_db(app, database_path=os.environ.get('DATABASE_URL')):
+class RoutingSession(SignallingSession):
+    """
+    Session sending the queries of read-only requests to the read replica.
+
+    Requests opt in by setting ``g.use_replica``, flushes always go to the
+    primary database.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        if (
+            not self._flushing
+            and has_app_context()
+            and g.get('use_replica')
+            and REPLICA_BIND in self.app.config.get('SQLALCHEMY_BINDS', {})
+        ):
+            state = get_state(self.app)
+            return state.db.get_engine(self.app, bind=REPLICA_BIND)
+
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """SQLAlchemy service whose sessions can route reads to a replica."""
+
+    def create_session(self, options):
+        return sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+db = RoutingSQLAlchemy()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """Queue pool recording how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started_at
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def stats(self):
+        """
+        Return the usage and wait statistics of the pool.
+
+        Wait times include opening new connections.
+
+        :return:
+        """
+        return {
+            'size': self.size(),
+            'max_overflow': self._max_overflow,
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': self.overflow(),
+            'checkouts': self.checkouts,
+            'timeouts': self.timeouts,
+            'wait_seconds_total': self.wait_seconds_total,
+            'wait_seconds_max': self.wait_seconds_max,
+            'wait_seconds_avg': self.wait_seconds_total / self.checkouts
+            if self.checkouts else 0.0,
+        }
+
+
+def get_engine_options(database_path):
+    """
+    Return the engine and pool options configured through env.
+
+    SQLite keeps the default pool of its driver.
+
+    :param database_path:
+    :return:
+    """
+    if not database_path or database_path.startswith('sqlite'):
+        return {}
+
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', -1)),
+        'pool_pre_ping': os.environ.get(
+            'DB_POOL_PRE_PING', 'false'
+        ).lower() in ('1', 'true', 'yes'),
+    }
+
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+    if statement_timeout and database_path.startswith('postgres'):
+        options['connect_args'] = {
+            'options': f'-c statement_timeout={statement_timeout}'
+        }
+
+    return options
+
+
+def setup_db(
+    app, database_path=os.environ.get('DATABASE_URL'),
+    replica_path=os.environ.get('READ_REPLICA_URL')
+):
     """
     Binds flask application and SQLAlchemy service.
 
     :param app:
     :param database_path=database_path:
+    :param replica_path: url of an optional read replica.
     """
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
+    app.config["SQLALCHEMY_BINDS"] = {
+        REPLICA_BIND: replica_path
+    } if replica_path else {}
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-    db.app = app
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = get_engine_options(
+        database_path
+    )
     db.init_app(app)
-    db.create_all()
+
+
+def dispose_engines(app):
+    """
+    Drop the pooled connections of the engines of given app.
+
+    Forked workers call it so they never share a connection opened by their
+    parent, e.g. with ``gunicorn --preload``.
+
+    :param app:
+    """
+    for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or {}):
+        db.get_engine(app, bind=bind).dispose()
 
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    __table_args__ = (
+        Index('ix_questions_category_id', 'category', 'id'),
+        Index('ix_questions_category_difficulty', 'category', 'difficulty'),
+    )
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(
+        Integer,
+        ForeignKey(
+            'categories.id', onupdate='CASCADE', ondelete='SET NULL',
+            name='fk_questions_category'
+        )
+    )
     difficulty = Column(Integer)
 
     def __init__(self, question, answer, category, difficulty):
@@ -37,13 +185,16 @@ class Question(db.Model):
 
     def insert(self):
         db.session.add(self)
+        bump_data_version()
         db.session.commit()
 
     def update(self):
+        bump_data_version()
         db.session.commit()
 
     def delete(self):
         db.session.delete(self)
+        bump_data_version()
         db.session.commit()
 
     def format(self):
@@ -56,6 +207,30 @@ class Question(db.Model):
         }
 
 
+# Text search configuration of the question full-text index, queries must
+# use the same expression for Postgres to pick the index.
+QUESTION_SEARCH_CONFIG = 'english'
+
+
+def question_search_vector():
+    """
+    Return the tsvector expression the question full-text index is built on.
+
+    :return:
+    """
+    return func.to_tsvector(QUESTION_SEARCH_CONFIG, Question.question)
+
+
+event.listen(
+    Question.__table__,
+    'after_create',
+    DDL(
+        'CREATE INDEX IF NOT EXISTS ix_questions_question_tsv ON questions '
+        f"USING gin (to_tsvector('{QUESTION_SEARCH_CONFIG}', question))"
+    ).execute_if(dialect='postgresql')
+)
+
+
 class Category(db.Model):
     __tablename__ = 'categories'
 
@@ -70,3 +245,46 @@ class Category(db.Model):
             'id': self.id,
             'type': self.type
         }
+
+
+class DataVersion(db.Model):
+    """Single row counter bumped by every write to the questions."""
+
+    __tablename__ = 'data_version'
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    def __init__(self, id, version):
+        self.id = id
+        self.version = version
+
+
+event.listen(
+    DataVersion.__table__,
+    'after_create',
+    DDL('INSERT INTO data_version (id, version) VALUES (1, 0)')
+)
+
+
+def get_data_version():
+    """
+    Return the current data version.
+
+    :return:
+    """
+    return db.session.query(DataVersion.version).filter_by(id=1).scalar() or 0
+
+
+def bump_data_version():
+    """
+    Bump the data version as part of the current transaction.
+
+    The version is stored in the database so that every worker sees writes
+    made by the others. Its row is created with the table, by the migration
+    or by ``db.create_all()``.
+    """
+    DataVersion.query.filter_by(id=1).update(
+        {DataVersion.version: DataVersion.version + 1},
+        synchronize_session=False
+    )
@@ -1,10 +1,25 @@
 import os
 import unittest
 import json
-from flask_sqlalchemy import SQLAlchemy
-
-from flaskr import app, StatusCode
-from models import setup_db, Question, Category
+import base64
+import gzip
+import tempfile
+import time
+from array import array
+import brotli
+from Crypto.PublicKey import RSA
+from flask_sqlalchemy import get_state
+
+from flaskr import create_app, StatusCode
+from flaskr.auth import JWKSCache, token_cache
+from flaskr.cache import LRUCache, response_cache
+from flaskr.limits import (
+    Admission, ConcurrencyLimiter, LimitExceeded, RateLimiter, get_admission
+)
+from flaskr.quiz import QuestionPool
+from flaskr.sessions import SessionNotFound, SQLiteQuizSessionStore
+from flaskr.transfer import export_questions, import_questions
+from models import db, dispose_engines, Question, Category
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -30,13 +45,12 @@ class TriviaTestCase(unittest.TestCase):
 
         :param self:
         """
-        self.app = app
-        self.client = self.app.test_client
         self.database_name = "trivia_test"
         self.database_path = "postgres://{}/{}".format(
             'localhost:5432', self.database_name
         )
-        setup_db(self.app, self.database_path)
+        self.app = create_app({'DATABASE_URL': self.database_path})
+        self.client = self.app.test_client
 
         with open('./role_tokens.json') as json_file:
             data = json.load(json_file)
@@ -56,9 +70,7 @@ class TriviaTestCase(unittest.TestCase):
         }
 
         with self.app.app_context():
-            self.db = SQLAlchemy()
-            self.db.init_app(self.app)
-            self.db.create_all()
+            db.create_all()
 
     def tearDown(self):
         """
@@ -79,6 +91,38 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
         self.assertTrue(json_data.get('success'))
 
+    def test_get_categories_with_counts_success(self):
+        """
+        Success case for get categories with their question counts.
+
+        :return:
+        """
+        response = self.client().get('/categories?with_counts=true')
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(
+            set(json_data.get('counts')), set(json_data.get('categories'))
+        )
+        category_response = self.client().get('/categories/1/questions')
+        self.assertEqual(
+            json_data['counts']['1'],
+            category_response.get_json().get('total_questions')
+        )
+
+    def test_get_categories_counts_updated_on_insert(self):
+        """
+        Question counts include a question added after they were cached.
+
+        :return:
+        """
+        response = self.client().get('/categories?with_counts=true')
+        count = response.get_json()['counts']['1']
+        self.client().post(
+            '/questions', json=self.question, headers=self.admin_headers
+        )
+        response = self.client().get('/categories?with_counts=true')
+        self.assertEqual(response.get_json()['counts']['1'], count + 1)
+
     def test_get_categories_failed(self):
         """
         Fail test case for get categories route.
@@ -93,6 +137,162 @@ class TriviaTestCase(unittest.TestCase):
         )
         self.assertFalse(json_data.get('success'))
 
+    def test_healthz_success(self):
+        """
+        Success case for health check route.
+
+        :return:
+        """
+        response = self.client().get('/healthz')
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(json_data.get('database'), 'ok')
+
+    def test_healthz_failed_not_migrated(self):
+        """
+        Fail case for health check route on a database without the schema.
+
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            app = create_app({'DATABASE_URL': 'sqlite:///{}'.format(
+                os.path.join(directory, 'trivia.db')
+            )})
+            response = app.test_client().get('/healthz')
+            json_data = response.get_json()
+            self.assertEqual(
+                response.status_code,
+                StatusCode.HTTP_503_SERVICE_UNAVAILABLE.value
+            )
+            self.assertEqual(json_data.get('database'), 'unavailable')
+            dispose_engines(app)
+
+    def test_create_app_success(self):
+        """
+        Success case for creating an app without touching the database.
+
+        :return:
+        """
+        app = create_app({'DATABASE_URL': 'sqlite:////nonexistent/trivia.db'})
+        rules = [rule.rule for rule in app.url_map.iter_rules()]
+        self.assertIn('/questions', rules)
+        self.assertEqual(get_state(app).connectors, {})
+
+    def test_metrics_success(self):
+        """
+        Success case for metrics route.
+
+        :return:
+        """
+        self.client().get('/categories')
+        response = self.client().get('/metrics')
+        metrics = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertIn('trivia_request_duration_seconds_bucket', metrics)
+        self.assertIn('route="/categories"', metrics)
+        self.assertIn('trivia_request_sql_statements', metrics)
+
+    def test_debug_pool_success(self):
+        """
+        Success case for pool statistics route.
+
+        :return:
+        """
+        self.client().get('/questions')
+        response = self.client().get(
+            '/debug/pool', headers=self.admin_headers
+        )
+        pool = response.get_json().get('pool')
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(pool.get('pool_class'), 'InstrumentedQueuePool')
+        self.assertGreaterEqual(pool.get('checked_out'), 0)
+        self.assertGreaterEqual(pool.get('overflow'), -pool.get('size'))
+        self.assertGreaterEqual(pool.get('checkouts'), 1)
+        self.assertGreaterEqual(pool.get('wait_seconds_total'), 0)
+        self.assertGreaterEqual(
+            pool.get('wait_seconds_max'), pool.get('wait_seconds_avg')
+        )
+
+    def test_debug_pool_failed_unauthorized(self):
+        """
+        Fail case for pool statistics route without a token.
+
+        :return:
+        """
+        response = self.client().get('/debug/pool')
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_401_UNAUTHORIZED.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_read_replica_success(self):
+        """
+        Reads go to the replica, writes to the primary database, and a read
+        right after a write to the primary database.
+
+        :return:
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            app = create_app({
+                'DATABASE_URL': 'sqlite:///{}'.format(
+                    os.path.join(directory, 'primary.db')
+                ),
+                'READ_REPLICA_URL': 'sqlite:///{}'.format(
+                    os.path.join(directory, 'replica.db')
+                )
+            })
+            with app.app_context():
+                primary = db.get_engine(app)
+                replica = db.get_engine(app, bind='replica')
+                for engine, category in (
+                    (primary, 'Primary'), (replica, 'Replica')
+                ):
+                    db.Model.metadata.create_all(engine)
+                    engine.execute(
+                        Category.__table__.insert(), id=1, type=category
+                    )
+            response_cache.clear()
+            client = app.test_client()
+
+            response = client.get('/categories')
+            self.assertEqual(
+                response.get_json().get('categories'), {'1': 'Replica'}
+            )
+
+            response = client.post(
+                '/questions', json=self.question, headers=self.admin_headers
+            )
+            self.assertEqual(
+                response.status_code, StatusCode.HTTP_201_CREATED.value
+            )
+            self.assertEqual(response.headers.get('X-Data-Version'), '1')
+            with app.app_context():
+                self.assertEqual(primary.execute(
+                    'SELECT count(*) FROM questions'
+                ).scalar(), 1)
+                self.assertEqual(replica.execute(
+                    'SELECT count(*) FROM questions'
+                ).scalar(), 0)
+
+            response = client.get('/categories')
+            self.assertEqual(
+                response.get_json().get('categories'), {'1': 'Primary'}
+            )
+            response = app.test_client().get(
+                '/categories', headers={'X-Data-Version': '1'}
+            )
+            self.assertEqual(
+                response.get_json().get('categories'), {'1': 'Primary'}
+            )
+            response = app.test_client().get('/categories')
+            self.assertEqual(
+                response.get_json().get('categories'), {'1': 'Replica'}
+            )
+
+            response_cache.clear()
+            dispose_engines(app)
+
     def test_get_questions_success(self):
         """
         Success case for get questions.
@@ -117,210 +317,242 @@ class TriviaTestCase(unittest.TestCase):
         )
         self.assertFalse(json_data.get('success'))
 
-    def test_delete_question_success(self):
+    def test_get_questions_failed_page_zero(self):
         """
-        Success case of delete question test case.
+        Fail case for get questions with page 0, which is not a page.
 
         :return:
         """
-        response = self.client().post(
-            '/questions', json=self.question, headers=self.admin_headers
-        )
+        response = self.client().get('/questions?page=0')
         json_data = response.get_json()
-        response = self.client().delete(
-            f'/questions/{json_data.get("id")}', headers=self.admin_headers
-        )
         self.assertEqual(
-            response.status_code, StatusCode.HTTP_204_NO_CONTENT.value
+            response.status_code, StatusCode.HTTP_404_NOT_FOUND.value
         )
-        self.assertTrue(json_data.get('success'))
+        self.assertFalse(json_data.get('success'))
 
-    def test_delete_question_failed_method_not_allowed(self):
+    def test_get_questions_after_cursor_success(self):
         """
-        Method not allowed failed case of delete question test case.
+        Success case for get questions with keyset cursor.
 
         :return:
         """
-        response = self.client().get('/questions/14')
+        response = self.client().get('/questions?after=0')
         json_data = response.get_json()
-        self.assertEqual(
-            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertTrue(json_data.get('success'))
+        self.assertTrue(
+            all(question.get('id') > 0 for question in json_data['questions'])
         )
-        self.assertFalse(json_data.get('success'))
 
-    def test_delete_question_failed_not_authorized(self):
+    def test_get_questions_after_cursor_failed(self):
         """
-        Not authorized to delete question test case.
+        Fail case for get questions with a cursor past the last question.
 
         :return:
         """
-        response = self.client().post(
-            '/questions', json=self.question, headers=self.admin_headers
-        )
-        json_data = response.get_json()
-        response = self.client().delete(
-            f'/questions/{json_data.get("id")}', headers=self.player_headers
-        )
+        response = self.client().get('/questions?after=1000000')
         json_data = response.get_json()
         self.assertEqual(
-            response.status_code, StatusCode.HTTP_401_UNAUTHORIZED.value
+            response.status_code, StatusCode.HTTP_404_NOT_FOUND.value
         )
         self.assertFalse(json_data.get('success'))
 
-    def test_delete_question_failed_not_found(self):
+    def test_get_questions_fields_success(self):
         """
-        Not found failed case of delete question test case.
+        Success case for get questions with sparse fields and no embedding.
 
         :return:
         """
-        response = self.client().delete(
-            '/questions/-1000', headers=self.admin_headers
+        response = self.client().get(
+            '/questions?fields=question,difficulty&include='
         )
         json_data = response.get_json()
-        self.assertEqual(
-            response.status_code, StatusCode.HTTP_404_NOT_FOUND.value
-        )
-        self.assertFalse(json_data.get('success'))
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertNotIn('categories', json_data)
+        self.assertTrue(all(
+            set(question) == {'id', 'question', 'difficulty'}
+            for question in json_data.get('questions')
+        ))
 
-    def test_add_question_success(self):
+    def test_get_questions_fields_failed_bad_request(self):
         """
-        Success case of add question test case.
+        Fail case for get questions with an unknown field.
 
         :return:
         """
-        response = self.client().post(
-            '/questions', json=self.question, headers=self.admin_headers
-        )
+        response = self.client().get('/questions?fields=question,secret')
         json_data = response.get_json()
         self.assertEqual(
-            response.status_code, StatusCode.HTTP_201_CREATED.value
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
         )
-        self.assertTrue(json_data.get('success'))
+        self.assertFalse(json_data.get('success'))
 
-    def test_add_question_failed_method_not_allowed(self):
+    def test_get_questions_not_modified(self):
         """
-        Fail case of add question test case with method not allowed error.
+        Conditional get questions returns 304 while nothing changed.
 
         :return:
         """
-        response = self.client().put(
-            '/questions', json={}, headers=self.admin_headers
+        response = self.client().get('/questions')
+        etag = response.headers.get('ETag')
+        response = self.client().get(
+            '/questions', headers={'If-None-Match': etag}
         )
-        json_data = response.get_json()
         self.assertEqual(
-            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+            response.status_code, StatusCode.HTTP_304_NOT_MODIFIED.value
         )
-        self.assertFalse(json_data.get('success'))
 
-    def test_add_question_failed_bad_request(self):
+    def test_get_questions_not_modified_compressed(self):
         """
-        Fail case of add question test case with bad request error.
+        Conditional get questions matches the ETag of a compressed page.
 
         :return:
         """
-        response = self.client().post(
-            '/questions', json={}, headers=self.admin_headers
+        response = self.client().get('/questions')
+        etag = response.headers.get('ETag').rstrip('"') + '-gzip"'
+        response = self.client().get(
+            '/questions',
+            headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'}
         )
-        json_data = response.get_json()
         self.assertEqual(
-            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+            response.status_code, StatusCode.HTTP_304_NOT_MODIFIED.value
         )
-        self.assertFalse(json_data.get('success'))
+        self.assertEqual(response.headers.get('ETag'), etag)
 
-    def test_add_question_failed_not_authorized(self):
+    def test_get_questions_modified_other_encoding(self):
         """
-        Not authorized to add question.
+        Conditional get questions ignores the ETag of an encoding the
+        request does not accept.
 
         :return:
         """
-        response = self.client().post(
-            '/questions', json=self.question, headers=self.player_headers
-        )
-        json_data = response.get_json()
-        self.assertEqual(
-            response.status_code, StatusCode.HTTP_401_UNAUTHORIZED.value
+        response = self.client().get('/questions')
+        etag = response.headers.get('ETag').rstrip('"') + '-br"'
+        response = self.client().get(
+            '/questions',
+            headers={'If-None-Match': etag, 'Accept-Encoding': 'gzip'}
         )
-        self.assertFalse(json_data.get('success'))
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertNotEqual(response.headers.get('ETag'), etag)
 
-    def test_get_questions_by_category_success(self):
+    def test_get_questions_modified_after_insert(self):
         """
-        Success case for get questions by category.
+        Conditional get questions returns the page again after a write.
 
         :return:
         """
-        response = self.client().get('/categories/1/questions')
-        json_data = response.get_json()
+        response = self.client().get('/questions')
+        etag = response.headers.get('ETag')
+        self.client().post(
+            '/questions', json=self.question, headers=self.admin_headers
+        )
+        response = self.client().get(
+            '/questions', headers={'If-None-Match': etag}
+        )
         self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
-        self.assertTrue(json_data.get('success'))
+        self.assertNotEqual(response.headers.get('ETag'), etag)
 
-    def test_get_questions_by_category_failed_method_not_allowed(self):
+    def test_get_questions_cache_invalidated_on_insert(self):
         """
-        Fail case for get questions by category with method not allowed error.
+        Cached questions count is refreshed once a question is added.
 
         :return:
         """
-        response = self.client().post('/categories/1/questions')
-        json_data = response.get_json()
+        response = self.client().get('/questions')
+        total_questions = response.get_json().get('total_questions')
+        self.client().post(
+            '/questions', json=self.question, headers=self.admin_headers
+        )
+        response = self.client().get('/questions')
         self.assertEqual(
-            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+            response.get_json().get('total_questions'), total_questions + 1
         )
-        self.assertFalse(json_data.get('success'))
 
-    def test_get_questions_by_category_not_found(self):
+    def test_export_questions_success(self):
         """
-        Fail case for get questions by category with method not found.
+        Success case for export questions.
 
         :return:
         """
-        response = self.client().get('/categories/1000/questions')
-        json_data = response.get_json()
-        self.assertEqual(
-            response.status_code, StatusCode.HTTP_404_NOT_FOUND.value
+        response = self.client().get(
+            '/questions/export?category=1', headers=self.admin_headers
+        )
+        questions = [
+            json.loads(line) for line in response.data.decode().splitlines()
+        ]
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertTrue(
+            all(question.get('category') == 1 for question in questions)
         )
-        self.assertFalse(json_data.get('success'))
 
-    def test_play_quiz_success(self):
+    def test_export_questions_gzip_success(self):
         """
-        Success case for play quiz api.
+        Success case for export questions compressed with gzip.
 
         :return:
         """
-        data = {
-            "quiz_category": {
-                "id": 1
-            },
-            "previous_questions": []
-        }
-        response = self.client().post(
-            '/quizzes', json=data, headers=self.player_headers
+        response = self.client().get(
+            '/questions/export?category=1',
+            headers=dict(self.admin_headers, **{'Accept-Encoding': 'gzip'})
         )
-        json_data = response.get_json()
+        questions = [
+            json.loads(line)
+            for line in gzip.decompress(response.data).decode().splitlines()
+        ]
         self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
-        self.assertTrue(json_data.get('success'))
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertIn('Accept-Encoding', response.headers.get('Vary'))
+        self.assertTrue(
+            all(question.get('category') == 1 for question in questions)
+        )
 
-    def test_play_quiz_failed_method_not_allowed(self):
+    def test_export_questions_brotli_success(self):
         """
-        Fail case for play quiz api with method not allowed error.
+        Success case for export questions compressed with brotli.
 
         :return:
         """
         response = self.client().get(
-            '/quizzes', json={}, headers=self.player_headers
+            '/questions/export?category=1',
+            headers=dict(
+                self.admin_headers, **{'Accept-Encoding': 'gzip, br'}
+            )
         )
-        json_data = response.get_json()
-        self.assertEqual(
-            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+        questions = [
+            json.loads(line)
+            for line in brotli.decompress(response.data).decode().splitlines()
+        ]
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(response.headers.get('Content-Encoding'), 'br')
+        self.assertTrue(
+            all(question.get('category') == 1 for question in questions)
         )
-        self.assertFalse(json_data.get('success'))
 
-    def test_play_quiz_failed_bad_request(self):
+    def test_export_questions_csv_success(self):
         """
-        Fail case for play quiz api with method bad request.
+        Success case for export questions as CSV.
 
         :return:
         """
-        response = self.client().post(
-            '/quizzes', json={}, headers=self.player_headers
+        response = self.client().get(
+            '/questions/export?format=csv', headers=self.admin_headers
+        )
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertTrue(
+            response.data.decode().startswith(
+                'id,question,answer,category,difficulty'
+            )
+        )
+
+    def test_export_questions_failed_bad_request(self):
+        """
+        Fail case for export questions with an unknown format.
+
+        :return:
+        """
+        response = self.client().get(
+            '/questions/export?format=xml', headers=self.admin_headers
         )
         json_data = response.get_json()
         self.assertEqual(
@@ -328,72 +560,83 @@ class TriviaTestCase(unittest.TestCase):
         )
         self.assertFalse(json_data.get('success'))
 
-    def test_play_quiz_failed_not_authorized(self):
+    def test_export_questions_failed_unauthorized(self):
         """
-        Not authorized to play quiz.
+        Fail case for export questions without a token.
 
         :return:
         """
-        data = {
-            "quiz_category": {
-                "id": 1
-            },
-            "previous_questions": []
-        }
-        response = self.client().post(
-            '/quizzes', json=data, headers=self.admin_headers
-        )
+        response = self.client().get('/questions/export')
         json_data = response.get_json()
         self.assertEqual(
             response.status_code, StatusCode.HTTP_401_UNAUTHORIZED.value
         )
         self.assertFalse(json_data.get('success'))
 
-    def test_edit_question_success(self):
+    def test_import_export_questions_success(self):
         """
-        Success case of edit question test case.
+        Success case for importing a file and exporting it back.
 
         :return:
         """
-        response = self.client().post(
-            '/questions', json=self.question, headers=self.admin_headers
-        )
+        with tempfile.TemporaryDirectory() as directory:
+            import_path = os.path.join(directory, 'pack.ndjson')
+            export_path = os.path.join(directory, 'export.ndjson')
+            with open(import_path, 'w') as file:
+                file.write('\n'.join([json.dumps(self.question)] * 3))
+                file.write('\n{invalid\n')
+
+            with self.app.app_context():
+                last_id = Question.query.order_by(
+                    Question.id.desc()
+                ).first().id
+                imported, skipped = import_questions(
+                    import_path, batch_size=2, log=open(os.devnull, 'w')
+                )
+                exported = export_questions(
+                    export_path, after=last_id, log=open(os.devnull, 'w')
+                )
+
+        self.assertEqual((imported, skipped), (3, 1))
+        self.assertEqual(exported, 3)
+
+    def test_search_questions_success(self):
+        """
+        Success case for search questions.
 
-        question_id = response.get_json().get('id')
-        response = self.client().patch(
-            f'/questions/{question_id}', json=self.updated_question,
-            headers=self.admin_headers
+        :return:
+        """
+        response = self.client().post(
+            '/questions/search', json={'searchTerm': 'title'}
         )
-
         json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertTrue(json_data.get('success'))
         self.assertEqual(
-            response.status_code, StatusCode.HTTP_200_OK.value
+            json_data.get('total_questions'), len(json_data.get('questions'))
         )
-        self.assertTrue(json_data.get('success'))
 
-    def test_edit_question_failed_method_not_allowed(self):
+    def test_search_questions_failed_bad_request(self):
         """
-        Fail case of edit question test case with method not allowed error.
+        Fail case for search questions without search term.
 
         :return:
         """
-        response = self.client().put(
-            '/questions', json={}, headers=self.admin_headers
-        )
+        response = self.client().post('/questions/search', json={})
         json_data = response.get_json()
         self.assertEqual(
-            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
         )
         self.assertFalse(json_data.get('success'))
 
-    def test_edit_question_failed_bad_request(self):
+    def test_search_questions_failed_page_zero(self):
         """
-        Fail case of edit question test case with bad request error.
+        Fail case for search questions with page 0.
 
         :return:
         """
-        response = self.client().patch(
-            '/questions/1000', json={}, headers=self.admin_headers
+        response = self.client().post(
+            '/questions/search', json={'searchTerm': 'title', 'page': 0}
         )
         json_data = response.get_json()
         self.assertEqual(
@@ -401,7 +644,744 @@ class TriviaTestCase(unittest.TestCase):
         )
         self.assertFalse(json_data.get('success'))
 
-    def test_edit_question_failed_not_authorized(self):
+    def test_delete_question_success(self):
+        """
+        Success case of delete question test case.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions', json=self.question, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        response = self.client().delete(
+            f'/questions/{json_data.get("id")}', headers=self.admin_headers
+        )
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_204_NO_CONTENT.value
+        )
+        self.assertTrue(json_data.get('success'))
+
+    def test_delete_question_failed_method_not_allowed(self):
+        """
+        Method not allowed failed case of delete question test case.
+
+        :return:
+        """
+        response = self.client().get('/questions/14')
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_delete_question_failed_not_authorized(self):
+        """
+        Not authorized to delete question test case.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions', json=self.question, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        response = self.client().delete(
+            f'/questions/{json_data.get("id")}', headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_401_UNAUTHORIZED.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_delete_question_failed_not_found(self):
+        """
+        Not found failed case of delete question test case.
+
+        :return:
+        """
+        response = self.client().delete(
+            '/questions/-1000', headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_404_NOT_FOUND.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_delete_questions_bulk_success(self):
+        """
+        Success case of bulk delete questions test case.
+
+        :return:
+        """
+        question_ids = [
+            self.client().post(
+                '/questions', json=self.question, headers=self.admin_headers
+            ).get_json().get('id')
+            for _ in range(2)
+        ]
+        response = self.client().delete(
+            '/questions', json={'ids': question_ids},
+            headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(json_data.get('ids'), sorted(question_ids))
+        self.assertEqual(json_data.get('count'), 2)
+
+    def test_delete_questions_bulk_failed_bad_request(self):
+        """
+        Fail case of bulk delete questions without any filter.
+
+        :return:
+        """
+        response = self.client().delete(
+            '/questions', json={}, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_delete_questions_bulk_failed_not_authorized(self):
+        """
+        Not authorized to bulk delete questions.
+
+        :return:
+        """
+        response = self.client().delete(
+            '/questions', json={'ids': [1]}, headers=self.player_headers
+        )
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_401_UNAUTHORIZED.value
+        )
+
+    def test_add_question_success(self):
+        """
+        Success case of add question test case.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions', json=self.question, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_201_CREATED.value
+        )
+        self.assertTrue(json_data.get('success'))
+
+    def test_add_question_failed_method_not_allowed(self):
+        """
+        Fail case of add question test case with method not allowed error.
+
+        :return:
+        """
+        response = self.client().put(
+            '/questions', json={}, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_add_question_failed_bad_request(self):
+        """
+        Fail case of add question test case with bad request error.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions', json={}, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_add_question_failed_not_authorized(self):
+        """
+        Not authorized to add question.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions', json=self.question, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_401_UNAUTHORIZED.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_add_questions_bulk_success(self):
+        """
+        Success case of bulk add questions test case.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions/bulk?batch_size=2',
+            json=[self.question, self.question, {}],
+            headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(json_data.get('inserted'), 2)
+        self.assertEqual(json_data.get('failed'), 1)
+        self.assertFalse(json_data['results'][2]['success'])
+
+    def test_add_questions_bulk_ndjson_success(self):
+        """
+        Success case of bulk add questions from an NDJSON body.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions/bulk',
+            data='\n'.join([json.dumps(self.question)] * 3),
+            content_type='application/x-ndjson',
+            headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(json_data.get('inserted'), 3)
+
+    def test_add_questions_bulk_failed_bad_request(self):
+        """
+        Fail case of bulk add questions with a body that is not a list.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions/bulk', json=self.question, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_add_questions_bulk_failed_not_authorized(self):
+        """
+        Not authorized to bulk add questions.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions/bulk', json=[self.question],
+            headers=self.player_headers
+        )
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_401_UNAUTHORIZED.value
+        )
+
+    def test_get_questions_by_category_success(self):
+        """
+        Success case for get questions by category.
+
+        :return:
+        """
+        response = self.client().get('/categories/1/questions')
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertTrue(json_data.get('success'))
+
+    def test_get_questions_by_category_include_success(self):
+        """
+        Success case for get questions by category embedding the categories.
+
+        :return:
+        """
+        response = self.client().get(
+            '/categories/1/questions?fields=question&include=categories'
+        )
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertIn('1', json_data.get('categories'))
+        self.assertTrue(all(
+            set(question) == {'id', 'question'}
+            for question in json_data.get('questions')
+        ))
+
+    def test_get_questions_by_category_failed_method_not_allowed(self):
+        """
+        Fail case for get questions by category with method not allowed error.
+
+        :return:
+        """
+        response = self.client().post('/categories/1/questions')
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_get_questions_by_category_not_found(self):
+        """
+        Fail case for get questions by category with method not found.
+
+        :return:
+        """
+        response = self.client().get('/categories/1000/questions')
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_404_NOT_FOUND.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_play_quiz_success(self):
+        """
+        Success case for play quiz api.
+
+        :return:
+        """
+        data = {
+            "quiz_category": {
+                "id": 1
+            },
+            "previous_questions": []
+        }
+        response = self.client().post(
+            '/quizzes', json=data, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertTrue(json_data.get('success'))
+
+    def test_play_quiz_excludes_previous_questions(self):
+        """
+        Play quiz never returns a question from previous questions.
+
+        :return:
+        """
+        response = self.client().get('/categories/1/questions')
+        question_ids = [
+            question.get('id')
+            for question in response.get_json().get('questions')
+        ]
+        data = {
+            "quiz_category": {
+                "id": 1
+            },
+            "previous_questions": question_ids[1:]
+        }
+        response = self.client().post(
+            '/quizzes', json=data, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(json_data['question']['id'], question_ids[0])
+
+    def test_play_quiz_count_success(self):
+        """
+        Play quiz draws distinct questions not in previous questions.
+
+        :return:
+        """
+        response = self.client().get('/categories/1/questions')
+        question_ids = [
+            question.get('id')
+            for question in response.get_json().get('questions')
+        ]
+        data = {
+            "quiz_category": {
+                "id": 1
+            },
+            "previous_questions": question_ids[:1],
+            "count": len(question_ids)
+        }
+        response = self.client().post(
+            '/quizzes', json=data, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        drawn_ids = [
+            question.get('id') for question in json_data.get('questions')
+        ]
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(sorted(drawn_ids), sorted(question_ids[1:]))
+        self.assertEqual(json_data['question'], json_data['questions'][0])
+
+    def test_play_quiz_count_failed_bad_request(self):
+        """
+        Fail case for play quiz api with a count below one.
+
+        :return:
+        """
+        data = {
+            "quiz_category": {
+                "id": 1
+            },
+            "previous_questions": [],
+            "count": 0
+        }
+        response = self.client().post(
+            '/quizzes', json=data, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_play_quiz_failed_not_an_object(self):
+        """
+        Fail case for play quiz api with a body that is not an object.
+
+        :return:
+        """
+        response = self.client().post(
+            '/quizzes', json=[1], headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_play_quiz_failed_unknown_category(self):
+        """
+        Fail case for play quiz api with an unknown category.
+
+        :return:
+        """
+        data = {
+            "quiz_category": {
+                "id": 1000
+            },
+            "previous_questions": []
+        }
+        response = self.client().post(
+            '/quizzes', json=data, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_play_quiz_token_cached(self):
+        """
+        Repeated requests with the same token are served from the token cache.
+
+        :return:
+        """
+        data = {
+            "quiz_category": {
+                "id": 1
+            },
+            "previous_questions": []
+        }
+        self.client().post('/quizzes', json=data, headers=self.player_headers)
+        hits = token_cache.hits
+        response = self.client().post(
+            '/quizzes', json=data, headers=self.player_headers
+        )
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(token_cache.hits, hits + 1)
+
+    def test_play_quiz_failed_method_not_allowed(self):
+        """
+        Fail case for play quiz api with method not allowed error.
+
+        :return:
+        """
+        response = self.client().get(
+            '/quizzes', json={}, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_play_quiz_failed_bad_request(self):
+        """
+        Fail case for play quiz api with method bad request.
+
+        :return:
+        """
+        response = self.client().post(
+            '/quizzes', json={}, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_play_quiz_failed_service_unavailable(self):
+        """
+        Fail case for play quiz api while all the slots are taken.
+
+        :return:
+        """
+        admission = get_admission('api.play_quiz', 'play:quiz')
+        concurrency_limiter = admission.concurrency_limiter
+        admission.concurrency_limiter = ConcurrencyLimiter(1)
+        admission.concurrency_limiter.acquire()
+        try:
+            response = self.client().post(
+                '/quizzes',
+                json={'quiz_category': {'id': 1}, 'previous_questions': []},
+                headers=self.player_headers
+            )
+        finally:
+            admission.concurrency_limiter = concurrency_limiter
+
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code,
+            StatusCode.HTTP_503_SERVICE_UNAVAILABLE.value
+        )
+        self.assertFalse(json_data.get('success'))
+        self.assertIn('Retry-After', response.headers)
+
+    def test_play_quiz_failed_too_many_requests(self):
+        """
+        Fail case for play quiz api from an address sending a new forged
+        token with every request.
+
+        :return:
+        """
+        admission = get_admission('api.play_quiz', 'play:quiz')
+        address_rate_limiter = admission.address_rate_limiter
+        admission.address_rate_limiter = RateLimiter(rate=1, burst=1)
+        try:
+            responses = [
+                self.client().post(
+                    '/quizzes',
+                    json={'quiz_category': {'id': 1}},
+                    headers={'Authorization': f'Bearer forged.token.{index}'}
+                )
+                for index in range(2)
+            ]
+        finally:
+            admission.address_rate_limiter = address_rate_limiter
+
+        self.assertNotEqual(
+            responses[0].status_code,
+            StatusCode.HTTP_429_TOO_MANY_REQUESTS.value
+        )
+        self.assertEqual(
+            responses[1].status_code,
+            StatusCode.HTTP_429_TOO_MANY_REQUESTS.value
+        )
+        self.assertIn('Retry-After', responses[1].headers)
+
+    def test_play_quiz_failed_not_authorized(self):
+        """
+        Not authorized to play quiz.
+
+        :return:
+        """
+        data = {
+            "quiz_category": {
+                "id": 1
+            },
+            "previous_questions": []
+        }
+        response = self.client().post(
+            '/quizzes', json=data, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_401_UNAUTHORIZED.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_create_quiz_session_success(self):
+        """
+        Success case for create quiz session api.
+
+        :return:
+        """
+        data = {
+            "quiz_category": {
+                "id": 1
+            }
+        }
+        response = self.client().post(
+            '/quizzes/sessions', json=data, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_201_CREATED.value
+        )
+        self.assertTrue(json_data.get('session_id'))
+
+    def test_create_quiz_session_failed_bad_request(self):
+        """
+        Fail case for create quiz session api with bad request error.
+
+        :return:
+        """
+        response = self.client().post(
+            '/quizzes/sessions', json={}, headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_create_quiz_session_failed_not_an_object(self):
+        """
+        Fail case for create quiz session api with a body that is not an
+        object.
+
+        :return:
+        """
+        response = self.client().post(
+            '/quizzes/sessions', json=[1], headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_play_quiz_session_success(self):
+        """
+        Success case for playing a quiz session until it is exhausted.
+
+        :return:
+        """
+        data = {
+            "quiz_category": {
+                "id": 1
+            }
+        }
+        response = self.client().post(
+            '/quizzes/sessions', json=data, headers=self.player_headers
+        )
+        json_data = response.get_json()
+
+        question_ids = []
+        for _ in range(json_data.get('total_questions') + 1):
+            response = self.client().post(
+                '/quizzes', json={'session_id': json_data.get('session_id')},
+                headers=self.player_headers
+            )
+            self.assertEqual(
+                response.status_code, StatusCode.HTTP_200_OK.value
+            )
+            question = response.get_json().get('question')
+            if question:
+                question_ids.append(question.get('id'))
+
+        self.assertEqual(len(question_ids), len(set(question_ids)))
+        self.assertIsNone(question)
+
+    def test_play_quiz_session_not_found(self):
+        """
+        Fail case for playing an unknown quiz session.
+
+        :return:
+        """
+        response = self.client().post(
+            '/quizzes', json={'session_id': 'unknown'},
+            headers=self.player_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_404_NOT_FOUND.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_edit_question_success(self):
+        """
+        Success case of edit question test case.
+
+        :return:
+        """
+        response = self.client().post(
+            '/questions', json=self.question, headers=self.admin_headers
+        )
+
+        question_id = response.get_json().get('id')
+        response = self.client().patch(
+            f'/questions/{question_id}', json=self.updated_question,
+            headers=self.admin_headers
+        )
+
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_200_OK.value
+        )
+        self.assertTrue(json_data.get('success'))
+
+    def test_edit_questions_bulk_success(self):
+        """
+        Success case of bulk edit questions test case.
+
+        :return:
+        """
+        question_ids = [
+            self.client().post(
+                '/questions', json=self.question, headers=self.admin_headers
+            ).get_json().get('id')
+            for _ in range(2)
+        ]
+        response = self.client().patch(
+            '/questions',
+            json={'ids': question_ids, 'changes': {'difficulty': 5}},
+            headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(response.status_code, StatusCode.HTTP_200_OK.value)
+        self.assertEqual(json_data.get('count'), 2)
+
+    def test_edit_questions_bulk_failed_bad_request(self):
+        """
+        Fail case of bulk edit questions without changes.
+
+        :return:
+        """
+        response = self.client().patch(
+            '/questions', json={'ids': [1]}, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_edit_question_failed_method_not_allowed(self):
+        """
+        Fail case of edit question test case with method not allowed error.
+
+        :return:
+        """
+        response = self.client().put(
+            '/questions', json={}, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_405_METHOD_NOT_ALLOWED.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_edit_question_failed_bad_request(self):
+        """
+        Fail case of edit question test case with bad request error.
+
+        :return:
+        """
+        response = self.client().patch(
+            '/questions/1000', json={}, headers=self.admin_headers
+        )
+        json_data = response.get_json()
+        self.assertEqual(
+            response.status_code, StatusCode.HTTP_400_BAD_REQUEST.value
+        )
+        self.assertFalse(json_data.get('success'))
+
+    def test_edit_question_failed_not_authorized(self):
         """
         Not authorized to edit question.
 
@@ -424,5 +1404,314 @@ class TriviaTestCase(unittest.TestCase):
         self.assertFalse(json_data.get('success'))
 
 
+class JWKSCacheTestCase(unittest.TestCase):
+    """This class represents the JWKS cache test case"""
+
+    def setUp(self):
+        """
+        Write a JWKS document with a single key to a temporary file.
+
+        :param self:
+        """
+        public_key = RSA.generate(2048).publickey()
+        self.jwks_file = tempfile.NamedTemporaryFile(
+            'w', suffix='.json', delete=False
+        )
+        json.dump({'keys': [{
+            'kty': 'RSA',
+            'kid': 'test-kid',
+            'use': 'sig',
+            'n': self.b64_encode(public_key.n),
+            'e': self.b64_encode(public_key.e)
+        }]}, self.jwks_file)
+        self.jwks_file.close()
+        self.jwks_cache = JWKSCache(
+            f'file://{self.jwks_file.name}', min_refresh_interval=0
+        )
+
+    def tearDown(self):
+        """
+        Remove the JWKS document.
+
+        :return:
+        """
+        if os.path.exists(self.jwks_file.name):
+            os.remove(self.jwks_file.name)
+
+    @staticmethod
+    def b64_encode(number):
+        """
+        Base64url encode an integer the way JWKS documents do.
+
+        :param number:
+        :return:
+        """
+        data = number.to_bytes((number.bit_length() + 7) // 8, 'big')
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+    def test_get_key_success(self):
+        """
+        Success case for getting a key from the JWKS cache.
+
+        :return:
+        """
+        key = self.jwks_cache.get_key('test-kid')
+        self.assertIsNotNone(key)
+        self.assertIs(self.jwks_cache.get_key('test-kid'), key)
+
+    def test_get_key_failed_unknown_kid(self):
+        """
+        Fail case for getting a key with a kid that is not published.
+
+        :return:
+        """
+        self.assertIsNone(self.jwks_cache.get_key('unknown-kid'))
+
+    def test_get_key_serves_stale_keys(self):
+        """
+        Cached keys are served when the JWKS endpoint is down.
+
+        :return:
+        """
+        self.jwks_cache.ttl = 0
+        key = self.jwks_cache.get_key('test-kid')
+        os.remove(self.jwks_file.name)
+        self.assertIs(self.jwks_cache.get_key('test-kid'), key)
+
+
+class QuestionPoolTestCase(unittest.TestCase):
+    """This class represents the question pool test case"""
+
+    def test_get_ids_failed_evicted(self):
+        """
+        Least recently used pool is dropped once the pool is full.
+
+        :return:
+        """
+        pool = QuestionPool(maxsize=2)
+        pool._load_ids = lambda category_id: array('l', [category_id])
+        pool.get_ids(1, 1)
+        pool.get_ids(2, 1)
+        pool.get_ids(1, 1)
+        pool.get_ids(3, 1)
+        self.assertEqual(list(pool._pools), [1, 3])
+
+
+class SQLiteQuizSessionStoreTestCase(unittest.TestCase):
+    """This class represents the SQLite quiz session store test case"""
+
+    def setUp(self):
+        """
+        Create a store on a temporary SQLite file.
+
+        :return:
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'sessions.db')
+        self.store = SQLiteQuizSessionStore(self.path)
+
+    def tearDown(self):
+        """
+        Remove the SQLite file.
+
+        :return:
+        """
+        self.directory.cleanup()
+
+    def test_advance_success(self):
+        """
+        Success case for asking the questions of a session in order.
+
+        :return:
+        """
+        session_id = self.store.create([3, 1, 2])
+        self.assertEqual(
+            [self.store.advance(session_id) for _ in range(4)],
+            [3, 1, 2, None]
+        )
+
+    def test_advance_shared_success(self):
+        """
+        Sessions are shared by the stores of all the workers on the file.
+
+        :return:
+        """
+        session_id = self.store.create([3, 1, 2])
+        self.assertEqual(self.store.advance(session_id), 3)
+        self.assertEqual(
+            SQLiteQuizSessionStore(self.path).advance(session_id), 1
+        )
+        self.assertEqual(self.store.advance(session_id), 2)
+
+    def test_advance_failed_not_found(self):
+        """
+        Fail case for advancing an unknown session.
+
+        :return:
+        """
+        with self.assertRaises(SessionNotFound):
+            self.store.advance('unknown')
+
+    def test_advance_failed_expired(self):
+        """
+        Fail case for advancing an expired session.
+
+        :return:
+        """
+        store = SQLiteQuizSessionStore(self.path, ttl=0)
+        session_id = store.create([1, 2])
+        with self.assertRaises(SessionNotFound):
+            store.advance(session_id)
+
+    def test_create_evicts_oldest(self):
+        """
+        Least recently used sessions are dropped beyond max sessions.
+
+        :return:
+        """
+        store = SQLiteQuizSessionStore(self.path, max_sessions=2)
+        first = store.create([1])
+        time.sleep(0.01)
+        second = store.create([2])
+        time.sleep(0.01)
+        store.advance(first)
+        time.sleep(0.01)
+        store.create([3])
+
+        self.assertIsNone(store.advance(first))
+        with self.assertRaises(SessionNotFound):
+            store.advance(second)
+
+
+class LRUCacheTestCase(unittest.TestCase):
+    """This class represents the LRU cache test case"""
+
+    def test_get_success(self):
+        """
+        Success case for getting a cached value.
+
+        :return:
+        """
+        cache = LRUCache(maxsize=2)
+        cache.set('key', 'value')
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_get_failed_evicted(self):
+        """
+        Least recently used entry is evicted once the cache is full.
+
+        :return:
+        """
+        cache = LRUCache(maxsize=2)
+        cache.set('first', 1)
+        cache.set('second', 2)
+        cache.get('first')
+        cache.set('third', 3)
+        self.assertIsNone(cache.get('second'))
+        self.assertEqual(cache.get('first'), 1)
+
+    def test_get_failed_expired(self):
+        """
+        Expired entries are not served.
+
+        :return:
+        """
+        cache = LRUCache()
+        cache.set('key', 'value', expires_at=0)
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(cache.stats()['misses'], 1)
+
+
+class AdmissionTestCase(unittest.TestCase):
+    """This class represents the admission control test case"""
+
+    def test_get_admission_per_route(self):
+        """
+        Routes requiring the same permission get their own limits.
+
+        :return:
+        """
+        self.assertIs(
+            get_admission('api.add_question', 'add:question'),
+            get_admission('api.add_question', 'add:question')
+        )
+        self.assertIsNot(
+            get_admission('api.add_question', 'add:question'),
+            get_admission('api.add_questions_bulk', 'add:question')
+        )
+
+    def test_rate_limiter_success(self):
+        """
+        Success case for requests within the burst of a client.
+
+        :return:
+        """
+        limiter = RateLimiter(rate=1, burst=2)
+        self.assertEqual(limiter.acquire('client'), 0)
+        self.assertEqual(limiter.acquire('client'), 0)
+        self.assertEqual(limiter.acquire('other'), 0)
+
+    def test_rate_limiter_failed_empty_bucket(self):
+        """
+        Fail case for a client that used up its burst.
+
+        :return:
+        """
+        limiter = RateLimiter(rate=1, burst=1)
+        limiter.acquire('client')
+        self.assertGreater(limiter.acquire('client'), 0)
+
+    def test_admit_client_failed_too_many_requests(self):
+        """
+        Fail case for admitting a rate limited client.
+
+        :return:
+        """
+        admission = Admission('play:quiz', rate_limiter=RateLimiter(1, 1))
+        admission.admit_client('client')
+        admission.admit_client('other')
+
+        with self.assertRaises(LimitExceeded) as context:
+            admission.admit_client('client')
+        self.assertEqual(
+            context.exception.status_code,
+            StatusCode.HTTP_429_TOO_MANY_REQUESTS.value
+        )
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+
+    def test_admit_failed_too_many_requests(self):
+        """
+        Fail case for admitting a rate limited address.
+
+        :return:
+        """
+        admission = Admission(
+            'play:quiz', address_rate_limiter=RateLimiter(1, 1)
+        )
+        with admission.admit('127.0.0.1'):
+            pass
+
+        with self.assertRaises(LimitExceeded):
+            with admission.admit('127.0.0.1'):
+                pass
+
+    def test_admit_releases_slot(self):
+        """
+        Slots are given back once the request is served.
+
+        :return:
+        """
+        admission = Admission(
+            'add:question', concurrency_limiter=ConcurrencyLimiter(1)
+        )
+        with admission.admit('client'):
+            with self.assertRaises(LimitExceeded):
+                with admission.admit('other'):
+                    pass
+        with admission.admit('other'):
+            pass
+
+
 if __name__ == "__main__":
     unittest.main()